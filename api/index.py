@@ -1,17 +1,19 @@
 from dotenv import load_dotenv
 from fastapi import FastAPI, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from .schemas import ChatRequest, SessionRequest
 from .utils.prompt import convert_to_chat_messages
 from .models import ModelConfig, ModelProvider
 from .plugins import WebAgentType, get_web_agent, AGENT_CONFIGS
+from .plugins.claude_computer_use import DISPLAY_WIDTH, DISPLAY_HEIGHT
 from .streamer import stream_vercel_format
 from api.middleware.profiling_middleware import ProfilingMiddleware
 from pydantic import BaseModel
 from typing import List, Dict
 import os
 import asyncio
+import logging
 import subprocess
 import re
 import time
@@ -25,7 +27,13 @@ except ImportError:
 
 load_dotenv(".env.local")
 
-app = FastAPI()
+# Logging is configured here, at the entry point, rather than by whichever
+# module happens to be imported first
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+
+# orjson serializes the JSON endpoints (sessions, agent configs) several
+# times faster than the stdlib encoder FastAPI uses by default
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(ProfilingMiddleware) # Uncomment this when profiling is not needed
 STEEL_API_KEY = os.getenv("STEEL_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
@@ -60,10 +68,12 @@ async def create_session(request: SessionRequest):
     Creates a new session.
     """
     if request.agent_type == WebAgentType.CLAUDE_COMPUTER_USE:
+        # Same size the agent advertises to Claude, so model coordinates map
+        # straight onto the page without any rescaling
         return steel_client.sessions.create(
             dimensions={
-                "width": 1280,
-                "height": 800,
+                "width": DISPLAY_WIDTH,
+                "height": DISPLAY_HEIGHT,
             },
             api_timeout=request.timeout * 1000,
         )
@@ -207,35 +217,27 @@ async def handle_chat(request: ChatRequest):
                 media_type="text/plain",
             )
 
+        # ModelSettings is a typed model, so every field is always present;
+        # read them directly instead of probing each one with hasattr
+        settings = request.model_settings
         model_config_args = {
             "provider": request.provider,
-            "model_name": request.model_settings.model_choice,
+            "model_name": settings.model_choice,
             "api_key": request.api_key,
+            "temperature": settings.temperature,
+            "max_tokens": settings.max_tokens,
+            "top_p": settings.top_p,
+            "top_k": settings.top_k,
+            "frequency_penalty": settings.frequency_penalty,
+            "presence_penalty": settings.presence_penalty,
         }
 
-        if hasattr(request.model_settings, "temperature"):
-            model_config_args["temperature"] = request.model_settings.temperature
-        if hasattr(request.model_settings, "max_tokens"):
-            model_config_args["max_tokens"] = request.model_settings.max_tokens
-        if hasattr(request.model_settings, "top_p"):
-            model_config_args["top_p"] = request.model_settings.top_p
-        if hasattr(request.model_settings, "top_k"):
-            model_config_args["top_k"] = request.model_settings.top_k
-        if hasattr(request.model_settings, "frequency_penalty"):
-            model_config_args["frequency_penalty"] = (
-                request.model_settings.frequency_penalty
-            )
-        if hasattr(request.model_settings, "presence_penalty"):
-            model_config_args["presence_penalty"] = (
-                request.model_settings.presence_penalty
-            )
-        
         # Add Azure OpenAI specific settings
         if request.provider == ModelProvider.AZURE_OPENAI:
-            if hasattr(request.model_settings, "azure_endpoint") and request.model_settings.azure_endpoint:
-                model_config_args["azure_endpoint"] = request.model_settings.azure_endpoint
-            if hasattr(request.model_settings, "api_version") and request.model_settings.api_version:
-                model_config_args["api_version"] = request.model_settings.api_version
+            if settings.azure_endpoint:
+                model_config_args["azure_endpoint"] = settings.azure_endpoint
+            if settings.api_version:
+                model_config_args["api_version"] = settings.api_version
 
         model_config = ModelConfig(**model_config_args)
 
@@ -265,7 +267,11 @@ async def handle_chat(request: ChatRequest):
 
         # Use background=on_disconnect to catch client-aborted requests
         response = StreamingResponse(
-            streaming_response, background=on_disconnect)
+            streaming_response,
+            background=on_disconnect,
+            # The stream yields encoded bytes; declare the charset they use
+            media_type="text/plain; charset=utf-8",
+        )
         response.headers["x-vercel-ai-data-stream"] = "v1"
         # response.headers["model_used"] = request.model_name
         return response
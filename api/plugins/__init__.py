@@ -226,19 +226,22 @@ AGENT_CONFIGS = {
 }
 
 
+WEB_AGENTS = {
+    WebAgentType.BASE: base_agent,
+    WebAgentType.CLAUDE_COMPUTER_USE: claude_computer_use,
+    WebAgentType.BROWSER_USE: browser_use_agent,
+}
+
+
 def get_web_agent(
     name: WebAgentType,
 ) -> Callable[
     [ModelConfig, AgentSettings, List[Mapping[str, Any]], str], AsyncIterator[str]
 ]:
-    if name == WebAgentType.BASE:
-        return base_agent
-    elif name == WebAgentType.CLAUDE_COMPUTER_USE:
-        return claude_computer_use
-    elif name == WebAgentType.BROWSER_USE:
-        return browser_use_agent
-    else:
+    agent = WEB_AGENTS.get(name)
+    if agent is None:
         raise ValueError(f"Invalid agent type: {name}")
+    return agent
 
 
 __all__ = ["WebAgentType", "get_web_agent", "AGENT_CONFIGS"]
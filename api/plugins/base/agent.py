@@ -22,9 +22,11 @@ async def base_agent(
     If cancel_event is provided, we check it after each chunk/tool invocation.
     """
 
-    llm = create_llm(model_config)
+    llm, _ = create_llm(model_config)
     tool_definitions = get_available_tools()
     tools = list(tool_definitions.values())
+    # The tool set never changes between turns, so bind it once
+    llm_with_tools = llm.bind_tools(tools)
 
     base_messages = chat_dict_to_base_messages(history)
 
@@ -36,7 +38,7 @@ async def base_agent(
         gathered = None
 
         # Stream partial chunks from the LLM
-        async for chunk in llm.bind_tools(tools).astream(input=base_messages):
+        async for chunk in llm_with_tools.astream(input=base_messages):
             # Check for cancellation between tokens
             if cancel_event and cancel_event.is_set():
                 break
@@ -19,8 +19,6 @@ from pydantic import BaseModel
 import uuid
 from .system_prompt import ExtendedSystemPrompt
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv(".env.local")
@@ -29,6 +27,13 @@ os.environ["ANONYMIZED_TELEMETRY"] = "false"
 STEEL_API_KEY = os.getenv("STEEL_API_KEY")
 STEEL_CONNECT_URL = os.getenv("STEEL_CONNECT_URL")
 
+# Seconds to wait for a cancelled agent task to unwind
+AGENT_STOP_TIMEOUT = 5
+
+# Seconds to let a finished agent.run() wrap up (history, callbacks) after
+# it reported "END" before it is stopped like an abandoned run
+AGENT_FINISH_TIMEOUT = 5
+
 # Dictionary to store active browser instances by session_id
 active_browsers: Dict[str, Browser] = {}
 active_browser_contexts: Dict[str, BrowserContext] = {}
@@ -66,7 +71,7 @@ async def pause_execution(reason: str) -> str:
         raise ValueError("No agent set in controller")
         
     print(f"⏸️ Pausing execution: {reason}")
-    logger.info(f"⏸️ Pausing execution: {reason}")
+    logger.info("⏸️ Pausing execution: %s", reason)
     
     # Store current browser state before pausing (to prevent about:blank issue)
     browser_context = None
@@ -78,11 +83,11 @@ async def pause_execution(reason: str) -> str:
     
     # Log the current state for debugging
     if browser:
-        logger.info(f"📊 Current browser state before pause - session_id: {controller.session_id}")
+        logger.info("📊 Current browser state before pause - session_id: %s", controller.session_id)
     
     # Set _agent_resumed to False to indicate we're paused
     _agent_resumed = False
-    logger.info(f"⏸️ Set _agent_resumed = False for session: {controller.session_id}")
+    logger.info("⏸️ Set _agent_resumed = False for session: %s", controller.session_id)
     
     # IMPORTANT: Make sure the message doesn't contain multiple pause prefixes
     clean_reason = reason.replace("⏸️ ", "").strip()
@@ -92,7 +97,7 @@ async def pause_execution(reason: str) -> str:
     
     # Pause the agent but ensure browser state is preserved
     controller.agent.pause()
-    logger.info(f"⏸️ Agent paused for session: {controller.session_id}")
+    logger.info("⏸️ Agent paused for session: %s", controller.session_id)
     
     # Make sure browser and context remain active and are not reset
     if controller.session_id:
@@ -114,40 +119,40 @@ async def resume_execution(request: ResumeRequest) -> dict:
     # Ensure browser state is preserved
     session_id = request.session_id
     if session_id in active_browsers and session_id in active_browser_contexts:
-        logger.info(f"📊 Preserving browser state for session on resume: {session_id}")
+        logger.info("📊 Preserving browser state for session on resume: %s", session_id)
         browser = active_browsers[session_id]
         browser_context = active_browser_contexts[session_id]
         
         # Make sure we're still using the same browser instances
         if controller.agent.browser != browser:
-            logger.info(f"🔄 Restoring browser instance for session: {session_id}")
+            logger.info("🔄 Restoring browser instance for session: %s", session_id)
             controller.agent.browser = browser
             
         if controller.agent.browser_context != browser_context:
-            logger.info(f"🔄 Restoring browser context for session: {session_id}")
+            logger.info("🔄 Restoring browser context for session: %s", session_id)
             controller.agent.browser_context = browser_context
     
     # First set the flag to true so ongoing processes know we're resumed
     _agent_resumed = True
-    logger.info(f"✅ Set _agent_resumed = True for session: {session_id}")
+    logger.info("✅ Set _agent_resumed = True for session: %s", session_id)
     
     # Then resume the agent
     try:
-        logger.info(f"▶️ Resuming agent for session: {session_id}")
+        logger.info("▶️ Resuming agent for session: %s", session_id)
         controller.agent.resume()
-        logger.info(f"✅ Agent resumed successfully for session: {session_id}")
+        logger.info("✅ Agent resumed successfully for session: %s", session_id)
         
         # Small delay to allow agent to process the resume
         await asyncio.sleep(0.2)
         
         # Verify the agent is really resumed
         if controller.agent._paused:
-            logger.warning(f"⚠️ Agent still shows as paused after resume for session: {session_id}")
+            logger.warning("⚠️ Agent still shows as paused after resume for session: %s", session_id)
             # Force the paused state to false
             controller.agent._paused = False
-            logger.info(f"🔧 Forced agent._paused = False for session: {session_id}")
+            logger.info("🔧 Forced agent._paused = False for session: %s", session_id)
     except Exception as e:
-        logger.error(f"❌ Error resuming agent: {str(e)}")
+        logger.error("❌ Error resuming agent: %s", e)
         # Even if resume fails, keep _agent_resumed = True so UI can recover
         return {"status": "error", "message": f"Failed to resume agent: {str(e)}"}
     
@@ -160,7 +165,7 @@ async def pause_execution_manually(request: PauseRequest) -> dict:
     """API endpoint to manually pause agent execution."""
     global _agent_resumed
     
-    logger.info(f"🖐️ Manual pause requested for session: {request.session_id}")
+    logger.info("🖐️ Manual pause requested for session: %s", request.session_id)
     
     if not controller.agent:
         return {"status": "error", "message": "No agent found"}
@@ -178,15 +183,15 @@ async def pause_execution_manually(request: PauseRequest) -> dict:
     
     # Log the current state for debugging
     if browser:
-        logger.info(f"📊 Preserving browser state on manual pause - session_id: {controller.session_id}")
+        logger.info("📊 Preserving browser state on manual pause - session_id: %s", controller.session_id)
     
     # Set _agent_resumed to false to indicate pause state
     _agent_resumed = False
-    logger.info(f"⏸️ Set _agent_resumed = False for manual pause - session_id: {controller.session_id}")
+    logger.info("⏸️ Set _agent_resumed = False for manual pause - session_id: %s", controller.session_id)
     
     # Pause the agent but ensure browser state is preserved
     controller.agent.pause()
-    logger.info(f"⏸️ Agent manually paused for session: {controller.session_id}")
+    logger.info("⏸️ Agent manually paused for session: %s", controller.session_id)
     
     # Make sure browser and context remain active and are not reset
     if controller.session_id:
@@ -326,6 +331,9 @@ async def browser_use_agent(
     
     # Add a flag to track whether we've stored messages while paused
     has_pending_messages = False
+
+    # Set once the agent reports "END", i.e. the run completed normally
+    finished = False
     
     try:
         while True:
@@ -351,11 +359,12 @@ async def browser_use_agent(
                 continue
                 
             if data == "END":  # You'll need to send this when done
+                finished = True
                 break
             
             # Check if agent was resumed - if so, release any pending special messages
             if _agent_resumed and pending_special_messages:
-                logger.info(f"🔄 Agent resumed, releasing {len(pending_special_messages)} pending messages")
+                logger.info("🔄 Agent resumed, releasing %d pending messages", len(pending_special_messages))
                 # First yield all pending special messages
                 for msg in pending_special_messages:
                     yield msg
@@ -385,6 +394,15 @@ async def browser_use_agent(
                 # For non-special messages, always yield them
                 yield data
     finally:
+        # After "END", agent.run() is usually still finishing up; let it
+        if finished and not agent_task.done():
+            await asyncio.wait({agent_task}, timeout=AGENT_FINISH_TIMEOUT)
+        # Stop the agent if nobody is reading its output any more (client
+        # disconnected, too many failures, or an error above); otherwise the
+        # task keeps driving the browser and calling the LLM in the background
+        if not agent_task.done():
+            agent.stop()
+            agent_task.cancel()
+            await asyncio.wait({agent_task}, timeout=AGENT_STOP_TIMEOUT)
         # We're intentionally not closing the browser instance here to allow for resuming
-        # The browser instances will be managed by the Steel API and cleaned up when the session expires
-        pass
\ No newline at end of file
+        # The browser instances will be managed by the Steel API and cleaned up when the session expires
\ No newline at end of file
@@ -1,3 +1,3 @@
-from .agent import claude_computer_use
+from .agent import claude_computer_use, DISPLAY_WIDTH, DISPLAY_HEIGHT
 
-__all__ = ["claude_computer_use"]
\ No newline at end of file
+__all__ = ["claude_computer_use", "DISPLAY_WIDTH", "DISPLAY_HEIGHT"]
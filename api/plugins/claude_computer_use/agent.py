@@ -1,19 +1,17 @@
 import datetime
 from typing import (
     Any,
-    Callable,
-    Dict,
     List,
     Mapping,
     Optional,
-    Sequence,
-    Type,
-    Union,
     AsyncIterator,
+    Deque,
+    Tuple,
 )
+from collections import deque
 from langchain_core.messages import ToolMessage
-from functools import cached_property
 import asyncio
+import logging
 from api.utils.prompt import chat_dict_to_base_messages
 from .tools import (
     GoToUrlTool,
@@ -26,130 +24,231 @@ from ...providers import create_llm
 from ...models import ModelConfig, ModelProvider
 from steel import Steel
 from playwright.async_api import async_playwright
-import anthropic
-from langchain_anthropic import ChatAnthropic
-from langchain_anthropic.chat_models import convert_to_anthropic_tool
-from langchain_core.tools import BaseTool
-from functools import cached_property
-import anthropic
 import os
-from ...models import ModelConfig, ModelProvider
 from dotenv import load_dotenv
 from ...utils.types import AgentSettings
 from langchain.schema import SystemMessage, BaseMessage
-import copy
 
 load_dotenv(".env.local")
 
+logger = logging.getLogger(__name__)
+
 STEEL_API_KEY = os.getenv("STEEL_API_KEY")
 STEEL_CONNECT_URL = os.getenv("STEEL_CONNECT_URL")
 STEEL_API_URL = os.getenv("STEEL_API_URL")
 
+# Shared across requests so the underlying HTTP connection pool (and its TLS
+# sessions to the Steel API) is reused instead of rebuilt per chat
+steel_client = Steel(
+    steel_api_key=STEEL_API_KEY,
+    base_url=STEEL_API_URL,
+)
+
+# Viewport the computer tool advertises to Claude; the page is sized to match so
+# model coordinates map 1:1 onto CSS pixels
+DISPLAY_WIDTH = 1280
+DISPLAY_HEIGHT = 800
+VIEWPORT_SIZE = {"width": DISPLAY_WIDTH, "height": DISPLAY_HEIGHT}
+
+COMPUTER_USE_HEADERS = {"anthropic-beta": "computer-use-2024-10-22"}
+
+# Stands in for screenshots trimmed from the history. Shared by every trimmed
+# slot; it is never mutated.
+IMAGE_PLACEHOLDER = {
+    "type": "text",
+    "text": "[Previous image removed to conserve context window]",
+}
+
+# Longest error message written to the log
+MAX_LOGGED_ERROR_CHARS = 4096
+
+# Sent as its own system block after the prompt, so the prompt block stays
+# byte-identical across runs
+DATETIME_TEMPLATE = "Current date and time: {now}"
+
+# Prompt-cache breakpoint on the static system prompt block. Anthropic caches
+# the prefix up to it (tool schemas + system prompt), which every step of a
+# run resends unchanged; the timestamp block after it stays uncached.
+PROMPT_CACHE_CONTROL = {"type": "ephemeral"}
+
+# Tool schemas sent to the model. They are static, so build them once at import
+COMPUTER_TOOLS = [
+    {
+        "type": "computer_20241022",
+        "name": "computer",
+        "display_width_px": DISPLAY_WIDTH,
+        "display_height_px": DISPLAY_HEIGHT,
+        "display_number": 1,
+    },
+    {
+        "name": "go_to_url",
+        "description": "Navigate to the specified URL, optionally waiting a given number of ms, and return a base64 screenshot.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "url": {
+                    "type": "string",
+                    "description": "The URL to navigate to",
+                },
+                "wait_time": {
+                    "type": "integer",
+                    "description": "Time in ms to wait before screenshot",
+                    "default": 2000,
+                },
+            },
+            "required": ["url"],
+        },
+    },
+    {
+        "name": "get_current_url",
+        "description": "Returns the current URL of the provided page, with no arguments required.",
+        "input_schema": {"type": "object", "properties": {}},
+    },
+    {
+        "name": "save_to_memory",
+        "description": "Accepts a string 'information' and simulates saving it to memory. Returns a success message.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "information": {
+                    "type": "string",
+                    "description": "The information to save to memory",
+                }
+            },
+            "required": ["information"],
+        },
+    },
+    {
+        "name": "wait",
+        "description": "Wait for a specified number of seconds before continuing. Useful when waiting for page loads or animations to complete.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "seconds": {
+                    "type": "number",
+                    "description": "Number of seconds to wait",
+                    "minimum": 0,
+                    "maximum": 30,
+                    "default": 2,
+                }
+            },
+            "required": ["seconds"],
+        },
+    },
+]
+
+
+def _is_image(content: Any) -> bool:
+    return isinstance(content, dict) and content.get("type") == "image"
+
+
+class ImageHistoryTrimmer:
+    """
+    Keeps only the N most recent screenshots in a growing message history,
+    replacing older ones with placeholder text.
+
+    Image slots are recorded as messages are added, oldest first, so each trim
+    only touches the images it removes instead of rescanning the whole
+    history every step.
+    """
+
+    def __init__(self, num_images_to_keep: Optional[int]):
+        self.num_images_to_keep = num_images_to_keep
+        # (message, index into its content list, or None for a bare block)
+        self._slots: Deque[Tuple[BaseMessage, Optional[int]]] = deque()
+
+    def track(self, msg: BaseMessage) -> None:
+        """Record the images carried by a message appended to the history."""
+        if not isinstance(msg, ToolMessage):
+            return
+        if isinstance(msg.content, list):
+            for i, item in enumerate(msg.content):
+                if _is_image(item):
+                    self._slots.append((msg, i))
+        elif _is_image(msg.content):
+            self._slots.append((msg, None))
+
+    def trim(self) -> None:
+        """Replace the oldest tracked images until only N remain."""
+        keep = self.num_images_to_keep
+        if not keep or keep < 0:
+            return
+        slots = self._slots
+        while len(slots) > keep:
+            msg, idx = slots.popleft()
+            if idx is None:
+                msg.content = IMAGE_PLACEHOLDER
+            else:
+                msg.content[idx] = IMAGE_PLACEHOLDER
+
 
 def trim_images_from_messages(
     messages: List[BaseMessage], num_images_to_keep: int
 ) -> List[BaseMessage]:
     """
     Trim images from message history keeping only the N most recent ones.
-    Replaces removed images with placeholder text.
+    Replaces removed images with placeholder text, modifying the messages in
+    place. For a history that grows step by step, keep an
+    ImageHistoryTrimmer instead of calling this each time.
 
     Args:
         messages: List of messages containing tool results with images
         num_images_to_keep: Number of most recent images to keep
 
     Returns:
-        Messages with excess images removed
+        The same list, with excess images removed
     """
-    if not num_images_to_keep or num_images_to_keep < 0:
-        return messages
-
-    # Find all tool messages with images, starting from most recent
-    image_messages = []
-    for msg in reversed(messages):
-        if isinstance(msg, ToolMessage):
-            contents = msg.content if isinstance(
-                msg.content, list) else [msg.content]
-            has_image = any(
-                c.get("type") == "image" for c in contents if isinstance(c, dict)
-            )
-            if has_image:
-                image_messages.append(msg)
-
-    if len(image_messages) <= num_images_to_keep:
-        return messages
+    trimmer = ImageHistoryTrimmer(num_images_to_keep)
+    for msg in messages:
+        trimmer.track(msg)
+    trimmer.trim()
+    return messages
 
-    messages_copy = copy.deepcopy(messages)
-    keep_count = num_images_to_keep
-
-    # Process messages from oldest to newest
-    for msg in messages_copy:
-        if not isinstance(msg, ToolMessage):
-            continue
 
-        if isinstance(msg.content, list):
-            new_content = []
-            for content in msg.content:
-                if isinstance(content, dict) and content.get("type") == "image":
-                    if keep_count > 0:
-                        new_content.append(content)
-                        keep_count -= 1
-                    else:
-                        # Replace image with placeholder
-                        new_content.append(
-                            {
-                                "type": "text",
-                                "text": "[Previous image removed to conserve context window]",
-                            }
-                        )
-                else:
-                    new_content.append(content)
-            msg.content = new_content
-        elif isinstance(msg.content, dict) and msg.content.get("type") == "image":
-            if keep_count > 0:
-                keep_count -= 1
-            else:
-                msg.content = {
-                    "type": "text",
-                    "text": "[Previous image removed to conserve context window]",
-                }
+def _build_initial_messages(
+    history: List[Mapping[str, Any]], system_prompt: Optional[str]
+) -> List[BaseMessage]:
+    """
+    Convert the chat history to LangChain messages, prefixed with the system
+    prompt and a separate block holding the current date and time when a
+    prompt is set.
+    """
+    base_messages = chat_dict_to_base_messages(history)
+    if system_prompt:
+        # isoformat gives the same "YYYY-MM-DD HH:MM:SS" text as strftime
+        # without the format-string parsing and locale lookups
+        now = datetime.datetime.now().isoformat(sep=" ", timespec="seconds")
+        base_messages.insert(
+            0,
+            SystemMessage(
+                content=[
+                    {
+                        "type": "text",
+                        "text": system_prompt,
+                        "cache_control": PROMPT_CACHE_CONTROL,
+                    },
+                    {"type": "text", "text": DATETIME_TEMPLATE.format(now=now)},
+                ]
+            ),
+        )
+    return base_messages
 
-    return messages_copy
-
-
-class BetaChatAnthropic(ChatAnthropic):
-    """ChatAnthropic that uses the beta.messages endpoint for computer-use."""
-
-    @cached_property
-    def _client(self) -> anthropic.Client:
-        client = super()._client
-        # Force use of beta client for all messages
-        client.messages = client.beta.messages
-        return client
-
-    @cached_property
-    def _async_client(self) -> anthropic.AsyncClient:
-        client = super()._async_client
-        # Force use of beta client for all messages
-        client.messages = client.beta.messages
-        return client
-
-    def bind_tools(
-        self,
-        tools: Sequence[Union[Dict[str, Any], Type, Callable, BaseTool]],
-        **kwargs: Any,
-    ):
-        """Override bind_tools to handle Anthropic-specific tool formats"""
-        # Pass tools directly if they're in Anthropic format
-        anthropic_tools = []
-        for tool in tools:
-            if isinstance(tool, dict) and "type" in tool:
-                # Already in Anthropic format, pass through
-                anthropic_tools.append(tool)
-            else:
-                # Use default conversion for standard tools
-                anthropic_tools.append(convert_to_anthropic_tool(tool))
 
-        return super().bind(tools=anthropic_tools, **kwargs)
+def _redact_images(content: Any) -> Any:
+    """
+    Return a copy of tool-result content that is safe to log: base64 image
+    payloads are replaced by their length.
+    """
+    if isinstance(content, list):
+        return [_redact_images(item) for item in content]
+    if isinstance(content, dict) and content.get("type") == "image":
+        source = content.get("source")
+        if isinstance(source, dict) and "data" in source:
+            return {
+                **content,
+                "source": {**source, "data": f"<b64:{len(source['data'])} chars>"},
+            }
+    return content
 
 
 async def claude_computer_use(
@@ -164,24 +263,37 @@ async def claude_computer_use(
     We can use a LangChain agent that can parse tool usage from the model.
     """
 
-    client = Steel(
-        steel_api_key=STEEL_API_KEY,
-        base_url=STEEL_API_URL,
-    )
-    session = client.sessions.retrieve(session_id)
-    print(f"Session retrieved successfully with Session ID: {session.id}.")
-    print(f"You can view the session live at {session.session_viewer_url}\n")
-
-    print("Connecting to Playwright...")  # Debug log
+    logger.debug("Connecting to Playwright...")
     async with async_playwright() as p:
-        browser = await p.chromium.connect_over_cdp(f"{STEEL_CONNECT_URL}?apiKey={STEEL_API_KEY}&sessionId={session.id}")
-        print("Playwright connected successfully")  # Debug log
+        # The Steel API lookup is a blocking HTTP call and the CDP connection
+        # only needs the session ID, so run the lookup on a worker thread
+        # while Playwright connects
+        session_task = asyncio.ensure_future(
+            asyncio.to_thread(steel_client.sessions.retrieve, session_id)
+        )
+        try:
+            browser = await p.chromium.connect_over_cdp(
+                f"{STEEL_CONNECT_URL}?apiKey={STEEL_API_KEY}&sessionId={session_id}"
+            )
+        except BaseException:
+            # Don't leave the lookup running with its result never retrieved
+            session_task.cancel()
+            await asyncio.gather(session_task, return_exceptions=True)
+            raise
+        session = await session_task
+        logger.info("Session retrieved successfully with Session ID: %s", session.id)
+        logger.info("You can view the session live at %s", session.session_viewer_url)
+        logger.debug("Playwright connected successfully")
 
-        print("Creating page at existing context...")  # Debug log
+        logger.debug("Creating page at existing context...")
         current_context = browser.contexts[0]
-        page = current_context.pages[0]
-        await page.set_viewport_size({"width": 1280, "height": 800})
-        print("Page created successfully")  # Debug log
+        pages = current_context.pages
+        page = pages[0] if pages else await current_context.new_page()
+        # Playwright tracks the viewport locally; only pay for the CDP
+        # round-trip when the size actually needs changing
+        if page.viewport_size != VIEWPORT_SIZE:
+            await page.set_viewport_size(VIEWPORT_SIZE)
+        logger.debug("Page created successfully")
 
         tools_to_use = {
             "go_to_url": GoToUrlTool(
@@ -194,73 +306,10 @@ async def claude_computer_use(
             ),
             "wait": WaitTool(page),
         }
-        computer_tools = [
-            {
-                "type": "computer_20241022",
-                "name": "computer",
-                "display_width_px": 1280,
-                "display_height_px": 800,
-                "display_number": 1,
-            },
-            {
-                "name": "go_to_url",
-                "description": "Navigate to the specified URL, optionally waiting a given number of ms, and return a base64 screenshot.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "url": {
-                            "type": "string",
-                            "description": "The URL to navigate to",
-                        },
-                        "wait_time": {
-                            "type": "integer",
-                            "description": "Time in ms to wait before screenshot",
-                            "default": 2000,
-                        },
-                    },
-                    "required": ["url"],
-                },
-            },
-            {
-                "name": "get_current_url",
-                "description": "Returns the current URL of the provided page, with no arguments required.",
-                "input_schema": {"type": "object", "properties": {}},
-            },
-            {
-                "name": "save_to_memory",
-                "description": "Accepts a string 'information' and simulates saving it to memory. Returns a success message.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "information": {
-                            "type": "string",
-                            "description": "The information to save to memory",
-                        }
-                    },
-                    "required": ["information"],
-                },
-            },
-            {
-                "name": "wait",
-                "description": "Wait for a specified number of seconds before continuing. Useful when waiting for page loads or animations to complete.",
-                "input_schema": {
-                    "type": "object",
-                    "properties": {
-                        "seconds": {
-                            "type": "number",
-                            "description": "Number of seconds to wait",
-                            "minimum": 0,
-                            "maximum": 30,
-                            "default": 2,
-                        }
-                    },
-                    "required": ["seconds"],
-                },
-            },
-        ]
 
+        cancel_wait: Optional[asyncio.Future] = None
         try:
-            print("Initializing claude_computer_use...")  # Debug log
+            logger.debug("Initializing claude_computer_use...")
             llm, use_vision = create_llm(
                 ModelConfig(
                     provider=ModelProvider.ANTHROPIC_COMPUTER_USE,
@@ -268,29 +317,32 @@ async def claude_computer_use(
                     temperature=model_config.temperature,
                     max_tokens=model_config.max_tokens,
                     api_key=model_config.api_key,
-                    extra_headers={
-                        "anthropic-beta": "computer-use-2024-10-22"},
+                    extra_headers=COMPUTER_USE_HEADERS,
                 )
             )
-            print("LLM initialized successfully")  # Debug log
+            logger.debug("LLM initialized successfully")
             tool_definitions = tools_to_use
-            tools = list(tool_definitions.values())
-            tools.append(computer_tools)
-            print("Binding tools to the LLM...")  # Debug log
-            llm_with_tools = llm.bind_tools(computer_tools)
-            print("Tools bound successfully")  # Debug log
-
-            print("Converting chat history to base messages...")  # Debug log
-            base_messages = chat_dict_to_base_messages(history)
-
-            # Add system message if provided in agent_settings
-            if agent_settings.system_prompt:
-                agent_settings.system_prompt += f"\nCurrent date and time: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                base_messages.insert(
-                    0, SystemMessage(content=agent_settings.system_prompt)
-                )
+            logger.debug("Binding tools to the LLM...")
+            llm_with_tools = llm.bind_tools(COMPUTER_TOOLS)
+            logger.debug("Tools bound successfully")
+
+            logger.debug("Converting chat history to base messages...")
+            # Long histories make this conversion CPU-heavy; keep it off the
+            # event loop so other sessions keep streaming meanwhile
+            base_messages = await asyncio.to_thread(
+                _build_initial_messages, history, agent_settings.system_prompt
+            )
 
-            print(f"Base messages created")  # Debug log
+            logger.debug("Base messages created")
+
+            image_trimmer = ImageHistoryTrimmer(agent_settings.num_images_to_keep)
+            for msg in base_messages:
+                image_trimmer.track(msg)
+
+            # One waiter for the whole run, so in-flight tool calls can be
+            # abandoned as soon as the client goes away
+            if cancel_event:
+                cancel_wait = asyncio.ensure_future(cancel_event.wait())
 
             while True:
                 # Check if user/server requested cancellation
@@ -300,6 +352,10 @@ async def claude_computer_use(
                 first = True
                 gathered = None
 
+                # Replace all but the most recent screenshots with placeholders so
+                # the request doesn't grow by a full image every step
+                image_trimmer.trim()
+
                 # Stream partial chunks (tokens or text) from the LLM, which can also
                 # contain references to tool calls (gathered.tool_calls)
                 async for chunk in llm_with_tools.astream(base_messages):
@@ -323,19 +379,48 @@ async def claude_computer_use(
 
                 if tools_called:
                     for tool in tools_called:
-                        result = await tool_definitions[tool["name"]].ainvoke(
-                            tool["args"]
+                        tool_task = asyncio.ensure_future(
+                            tool_definitions[tool["name"]].ainvoke(tool["args"])
                         )
+                        if cancel_wait:
+                            await asyncio.wait(
+                                {tool_task, cancel_wait},
+                                return_when=asyncio.FIRST_COMPLETED,
+                            )
+                            if not tool_task.done():
+                                tool_task.cancel()
+                                # Let the cancelled Playwright call unwind
+                                # before the browser is torn down, and
+                                # retrieve its exception
+                                await asyncio.gather(
+                                    tool_task, return_exceptions=True
+                                )
+                                return
+                        result = await tool_task
                         message = ToolMessage(
                             content=[result], tool_call_id=tool["id"])
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug(
+                                "Tool %s returned: %s",
+                                tool["name"],
+                                _redact_images(result),
+                            )
                         
                         yield message
                         base_messages.append(message)
+                        image_trimmer.track(message)
                 else:
                     break
         except Exception as e:
-            print(f"Error in claude_computer_use: {str(e)}")
+            # API errors can echo the request back, base64 screenshots and all;
+            # cap what goes to the log so one failure can't stall the loop
+            logger.error(
+                "Error in claude_computer_use: %s", str(e)[:MAX_LOGGED_ERROR_CHARS]
+            )
             raise
+        finally:
+            if cancel_wait:
+                cancel_wait.cancel()
 
 
 def main():
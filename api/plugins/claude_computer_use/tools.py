@@ -1,13 +1,24 @@
 import asyncio
-import base64
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import Mapping, Optional, Tuple, Type
+from typing import Optional, Tuple, Type
 import io
+import os
+import struct
+import weakref
+from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from playwright.async_api import Page, async_playwright
+from playwright.async_api import CDPSession, Page
 from PIL import Image, ImageDraw
 from langchain_core.tools import BaseTool
 
+# pybase64 is a drop-in, SIMD-accelerated replacement for the base64 module;
+# screenshots are hundreds of KB, so prefer it when it is installed
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 ################################################################################
 # Pydantic Models
 ################################################################################
@@ -35,11 +46,6 @@ class GoToUrlParams(BaseModel):
     )
 
 
-class GoToUrlResult(BaseModel):
-    type: str = "image"
-    source: dict = Field(default_factory=dict)
-
-
 class GetCurrentUrlParams(BaseModel):
     # This can be empty if no arguments are required; just here for consistency.
     pass
@@ -66,11 +72,6 @@ class ClaudComputerToolParams(BaseModel):
     )
 
 
-class ClaudComputerToolResult(BaseModel):
-    type: str = "image"
-    source: dict = Field(default_factory=dict)
-
-
 class WaitParams(BaseModel):
     seconds: int
 
@@ -79,9 +80,45 @@ class WaitParams(BaseModel):
 # Constants and Helper Functions
 ################################################################################
 
+load_dotenv(".env.local")
+
 ERROR_IMAGE = "iVBORw0KGgoAAAANSUhEUgAAAAUA..."  # Example placeholder
 DEFAULT_SCREENSHOT_WAIT_MS = 1
-DUMMY_SCREENSHOT = "/9j/4AAQSkZJRgABAQEASABIAAD/2wBDAAMCAgMCAgMDAwMEAwMEBQgFBQQEBQoHBwYIDAoMDAsKCwsNDhIQDQ4RDgsLEBYQERMUFRUVDA8XGBYUGBIUFRT/wAALCAABAAEBAREA/8QAFAABAAAAAAAAAAAAAAAAAAAACf/EABQQAQAAAAAAAAAAAAAAAAAAAAD/2gAIAQEAAD8AKp//2Q=="
+SCREENSHOT_MAX_DIMENSION = 1280  # long side, matches the advertised display width
+SCREENSHOT_JPEG_QUALITY = 75
+# Set SCREENSHOT_LOSSLESS=true to send PNG screenshots, e.g. when debugging
+# exactly what the model sees. JPEG is several times smaller otherwise.
+SCREENSHOT_LOSSLESS = os.getenv("SCREENSHOT_LOSSLESS", "").lower() in ("1", "true")
+SCREENSHOT_FORMAT = "png" if SCREENSHOT_LOSSLESS else "jpeg"
+SCREENSHOT_MEDIA_TYPE = f"image/{SCREENSHOT_FORMAT}"
+
+# Page.captureScreenshot parameters; optimizeForSpeed lets Chromium use its
+# fast encoder
+_CAPTURE_PARAMS = {
+    "format": SCREENSHOT_FORMAT,
+    "optimizeForSpeed": True,
+    "captureBeyondViewport": False,
+}
+if not SCREENSHOT_LOSSLESS:
+    _CAPTURE_PARAMS["quality"] = SCREENSHOT_JPEG_QUALITY
+
+# Pillow and base64 work is CPU-bound; run it off the event loop on a small
+# shared pool so concurrent sessions can't pile up unbounded encode threads.
+_SCREENSHOT_EXECUTOR = ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="screenshot-encode"
+)
+
+# One CDP session per page, reused for every screenshot taken on it
+_cdp_sessions: "weakref.WeakKeyDictionary[Page, CDPSession]" = (
+    weakref.WeakKeyDictionary()
+)
+
+# Last (raw capture, marker, encoded result) per page, kept only for frames
+# that had to be re-encoded (marker drawn or resized); pass-through frames
+# cost nothing to resend and aren't held
+_last_frames: "weakref.WeakKeyDictionary[Page, Tuple[str, Optional[Tuple[int, int]], str]]" = (
+    weakref.WeakKeyDictionary()
+)
 
 
 async def _sleep(s: int):
@@ -90,129 +127,253 @@ async def _sleep(s: int):
     await asyncio.sleep(s)
 
 
+# Map xdotool-like 'key' strings to Playwright-compatible keys.
+# Reference: https://developer.mozilla.org/en-US/docs/Web/API/KeyboardEvent/key/Key_Values
+_KEY_MAP = {
+    # Common / Basic Keys
+    "return": "Enter",
+    "enter": "Enter",
+    "tab": "Tab",
+    "backspace": "Backspace",
+    "up": "ArrowUp",
+    "down": "ArrowDown",
+    "left": "ArrowLeft",
+    "right": "ArrowRight",
+    "space": "Space",
+    "ctrl": "Control",
+    "control": "Control",
+    "alt": "Alt",
+    "shift": "Shift",
+    "meta": "Meta",
+    "command": "Meta",
+    "windows": "Meta",
+    "esc": "Escape",
+    "escape": "Escape",
+    # Numpad Keys
+    "kp_0": "Numpad0",
+    "kp_1": "Numpad1",
+    "kp_2": "Numpad2",
+    "kp_3": "Numpad3",
+    "kp_4": "Numpad4",
+    "kp_5": "Numpad5",
+    "kp_6": "Numpad6",
+    "kp_7": "Numpad7",
+    "kp_8": "Numpad8",
+    "kp_9": "Numpad9",
+    # Numpad Operations
+    "kp_enter": "NumpadEnter",
+    "kp_multiply": "NumpadMultiply",
+    "kp_add": "NumpadAdd",
+    "kp_subtract": "NumpadSubtract",
+    "kp_decimal": "NumpadDecimal",
+    "kp_divide": "NumpadDivide",
+    # Navigation
+    "page_down": "PageDown",
+    "page_up": "PageUp",
+    "home": "Home",
+    "end": "End",
+    "insert": "Insert",
+    "delete": "Delete",
+    # Function Keys
+    "f1": "F1",
+    "f2": "F2",
+    "f3": "F3",
+    "f4": "F4",
+    "f5": "F5",
+    "f6": "F6",
+    "f7": "F7",
+    "f8": "F8",
+    "f9": "F9",
+    "f10": "F10",
+    "f11": "F11",
+    "f12": "F12",
+    # Left/Right Variants
+    "shift_l": "ShiftLeft",
+    "shift_r": "ShiftRight",
+    "control_l": "ControlLeft",
+    "control_r": "ControlRight",
+    "alt_l": "AltLeft",
+    "alt_r": "AltRight",
+    # Media Keys
+    "audiovolumemute": "AudioVolumeMute",
+    "audiovolumedown": "AudioVolumeDown",
+    "audiovolumeup": "AudioVolumeUp",
+    # Additional Special Keys
+    "print": "PrintScreen",
+    "scroll_lock": "ScrollLock",
+    "pause": "Pause",
+    "menu": "ContextMenu",
+}
+
+
 def _translate_key(key: str) -> str:
+    """Translate an xdotool-style key name to its Playwright equivalent."""
+    # Claude almost always sends lowercase names, so try the key as given
+    # before paying for key.lower()
+    mapped = _KEY_MAP.get(key)
+    if mapped is not None:
+        return mapped
+    return _KEY_MAP.get(key.lower(), key)
+
+
+async def _get_cdp_session(page: Page) -> CDPSession:
+    """Return the CDP session for `page`, opening it on first use."""
+    cdp = _cdp_sessions.get(page)
+    if cdp is None:
+        cdp = await page.context.new_cdp_session(page)
+        _cdp_sessions[page] = cdp
+    return cdp
+
+
+# Base64 characters decoded to find a capture's dimensions. The PNG IHDR is
+# in the first 24 bytes; Chromium's JPEG SOF follows its short JFIF and
+# quantization-table segments, well inside this prefix.
+_HEADER_B64_CHARS = 4096
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers (SOF0-SOF15 minus DHT, JPG and DAC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _image_size(screenshot_b64: str) -> Optional[Tuple[int, int]]:
     """
-    Map xdotool-like 'key' strings to Playwright-compatible keys.
-    Reference: https://developer.mozilla.org/en-US/docs/Web/API/KeyboardEvent/key/Key_Values
+    Read (width, height) from the header of a base64 PNG or JPEG by decoding
+    only a short prefix. Returns None if the header isn't found there.
     """
-    key_map = {
-        # Common / Basic Keys
-        "return": "Enter",
-        "enter": "Enter",
-        "tab": "Tab",
-        "backspace": "Backspace",
-        "up": "ArrowUp",
-        "down": "ArrowDown",
-        "left": "ArrowLeft",
-        "right": "ArrowRight",
-        "space": "Space",
-        "ctrl": "Control",
-        "control": "Control",
-        "alt": "Alt",
-        "shift": "Shift",
-        "meta": "Meta",
-        "command": "Meta",
-        "windows": "Meta",
-        "esc": "Escape",
-        "escape": "Escape",
-        # Numpad Keys
-        "kp_0": "Numpad0",
-        "kp_1": "Numpad1",
-        "kp_2": "Numpad2",
-        "kp_3": "Numpad3",
-        "kp_4": "Numpad4",
-        "kp_5": "Numpad5",
-        "kp_6": "Numpad6",
-        "kp_7": "Numpad7",
-        "kp_8": "Numpad8",
-        "kp_9": "Numpad9",
-        # Numpad Operations
-        "kp_enter": "NumpadEnter",
-        "kp_multiply": "NumpadMultiply",
-        "kp_add": "NumpadAdd",
-        "kp_subtract": "NumpadSubtract",
-        "kp_decimal": "NumpadDecimal",
-        "kp_divide": "NumpadDivide",
-        # Navigation
-        "page_down": "PageDown",
-        "page_up": "PageUp",
-        "home": "Home",
-        "end": "End",
-        "insert": "Insert",
-        "delete": "Delete",
-        # Function Keys
-        "f1": "F1",
-        "f2": "F2",
-        "f3": "F3",
-        "f4": "F4",
-        "f5": "F5",
-        "f6": "F6",
-        "f7": "F7",
-        "f8": "F8",
-        "f9": "F9",
-        "f10": "F10",
-        "f11": "F11",
-        "f12": "F12",
-        # Left/Right Variants
-        "shift_l": "ShiftLeft",
-        "shift_r": "ShiftRight",
-        "control_l": "ControlLeft",
-        "control_r": "ControlRight",
-        "alt_l": "AltLeft",
-        "alt_r": "AltRight",
-        # Media Keys
-        "audiovolumemute": "AudioVolumeMute",
-        "audiovolumedown": "AudioVolumeDown",
-        "audiovolumeup": "AudioVolumeUp",
-        # Additional Special Keys
-        "print": "PrintScreen",
-        "scroll_lock": "ScrollLock",
-        "pause": "Pause",
-        "menu": "ContextMenu",
-    }
-
-    return key_map.get(key.lower(), key)
-
-
-async def _draw_circle_on_screenshot(screenshot_b64: str, x: int, y: int) -> str:
+    head = base64.b64decode(screenshot_b64[:_HEADER_B64_CHARS])
+    if head.startswith(_PNG_SIGNATURE):
+        if len(head) < 24:
+            return None
+        return struct.unpack(">II", head[16:24])
+    if not head.startswith(b"\xff\xd8"):
+        return None
+    i = 2
+    while i + 9 <= len(head):
+        if head[i] != 0xFF:
+            return None
+        marker = head[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", head[i + 5 : i + 9])
+            return width, height
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            # Standalone markers carry no length
+            i += 2
+            continue
+        (length,) = struct.unpack(">H", head[i + 2 : i + 4])
+        i += 2 + length
+    return None
+
+
+def _encode_screenshot(
+    screenshot_b64: str, marker: Optional[Tuple[int, int]] = None
+) -> str:
     """
-    Draw a small red circle at (x, y) on the provided base64 screenshot using Pillow.
-    Return a new screenshot as base64.
+    Re-encode a base64 screenshot as a size-capped image in SCREENSHOT_FORMAT
+    and return it as base64. If `marker` is given, a small red circle is drawn
+    at that (x, y) first.
     """
-    image_data = base64.b64decode(screenshot_b64)
+    # Chromium's output is always well-formed; validate=True takes the fast
+    # decode path instead of filtering for stray characters
+    image_data = base64.b64decode(screenshot_b64, validate=True)
     with Image.open(io.BytesIO(image_data)) as img:
-        draw = ImageDraw.Draw(img)
-        radius = 5
-        left_up = (x - radius, y - radius)
-        right_down = (x + radius, y + radius)
-        draw.ellipse([left_up, right_down], fill="red")
-
+        # Only reached when _capture_screenshot couldn't rule out work from
+        # the header alone; still pass through frames that need none
+        if marker is None and max(img.size) <= SCREENSHOT_MAX_DIMENSION:
+            return screenshot_b64
+
+        img = img.convert("RGB")
+        if marker:
+            x, y = marker
+            draw = ImageDraw.Draw(img)
+            radius = 5
+            left_up = (x - radius, y - radius)
+            right_down = (x + radius, y + radius)
+            draw.ellipse([left_up, right_down], fill="red")
+
+        # The model downsamples large images anyway, so never ship more
+        # pixels than it can use.
+        img.thumbnail(
+            (SCREENSHOT_MAX_DIMENSION, SCREENSHOT_MAX_DIMENSION), Image.LANCZOS
+        )
         with io.BytesIO() as output:
-            img.save(output, format="PNG")
+            if SCREENSHOT_LOSSLESS:
+                img.save(output, format="PNG")
+            else:
+                img.save(
+                    output,
+                    format="JPEG",
+                    quality=SCREENSHOT_JPEG_QUALITY,
+                    optimize=True,
+                )
             updated_bytes = output.getvalue()
 
-    return base64.b64encode(updated_bytes).decode("utf-8")
+    return base64.b64encode(updated_bytes).decode("ascii")
+
+
+async def _capture_screenshot(
+    page: Page, marker: Optional[Tuple[int, int]] = None
+) -> str:
+    """Take a viewport screenshot and return it as base64 (JPEG by default)."""
+    # Going straight to CDP skips Playwright's screenshot plumbing
+    cdp = await _get_cdp_session(page)
+    result = await cdp.send("Page.captureScreenshot", _CAPTURE_PARAMS)
+    raw = result["data"]
+
+    # Chromium already produced the target format and quality; without a
+    # marker to draw, a frame within the size cap is sent as-is, decided from
+    # its header without a full decode or a trip to the encode pool
+    if marker is None:
+        size = _image_size(raw)
+        if size is not None and max(size) <= SCREENSHOT_MAX_DIMENSION:
+            return raw
+
+    # Consecutive steps often see an unchanged page (waits, pointer moves);
+    # reuse the previous re-encode instead of redoing it for the same frame
+    last = _last_frames.get(page)
+    if last is not None and last[1] == marker and last[0] == raw:
+        return last[2]
+
+    loop = asyncio.get_running_loop()
+    encoded = await loop.run_in_executor(
+        _SCREENSHOT_EXECUTOR, _encode_screenshot, raw, marker
+    )
+    if encoded is raw:
+        # Passed through after all; nothing worth remembering
+        _last_frames.pop(page, None)
+    else:
+        _last_frames[page] = (raw, marker, encoded)
+    return encoded
+
+
+async def _settle_and_capture(
+    page: Page, s: float, marker: Optional[Tuple[int, int]] = None
+) -> str:
+    """
+    Wait `s` seconds for the page to settle, then screenshot it. The CDP
+    session is opened while the wait runs instead of after it.
+    """
+    await asyncio.gather(_sleep(s), _get_cdp_session(page))
+    return await _capture_screenshot(page, marker=marker)
 
 
-async def _scale_coordinates(
-    x: int,
-    y: int,
-    original_width: int,
-    original_height: int,
-    target_width: int,
-    target_height: int,
-) -> Tuple[int, int]:
+def _image_result(data: str, media_type: str = SCREENSHOT_MEDIA_TYPE) -> dict:
     """
-    Scale the (x, y) coordinates from the original resolution to the target resolution.
+    Build the Anthropic image block returned by the tools. Built as a plain
+    dict: routing a multi-hundred-KB base64 string through a pydantic model
+    and model_dump() on every action buys nothing.
     """
-    if original_width <= 0 or original_height <= 0:
-        # Avoid division error if we don't have valid dims
-        return x, y
-    scale_x = target_width / original_width
-    scale_y = target_height / original_height
-    scaled_x = int(x * scale_x)
-    scaled_y = int(y * scale_y)
-    return scaled_x, scaled_y
+    return {
+        "type": "image",
+        "source": {"type": "base64", "media_type": media_type, "data": data},
+    }
+
+
+# Returned by every tool when an action fails. It never changes, so build it
+# once instead of on each failure.
+ERROR_RESULT = _image_result(ERROR_IMAGE, media_type="image/png")
 
 
 ################################################################################
@@ -233,7 +394,10 @@ class GoToUrlTool(BaseTool):
     def __init__(self, page: Page, wait_time: Optional[int] = None):
         super().__init__()
         self.page = page
-        self.wait_time = wait_time
+        # Resolve the default once rather than on every action
+        self.wait_time = (
+            wait_time if wait_time is not None else DEFAULT_SCREENSHOT_WAIT_MS
+        )
 
     def _run(self, url: str, wait_time: int = 2000) -> str:
         print("GoToUrlTool._run called (sync) - raising NotImplementedError")
@@ -248,41 +412,15 @@ class GoToUrlTool(BaseTool):
             if "Navigation timeout" in str(exc):
                 print(f"Navigation timeout to {url}")
                 print(f"Waiting for {s}s")
-                await _sleep(s)
-                screenshot_buffer = await self.page.screenshot()
-                screenshot_b64 = base64.b64encode(screenshot_buffer).decode("utf-8")
-                return GoToUrlResult(
-                    type="image",
-                    source={
-                        "type": "base64",
-                        "media_type": "image/png",
-                        "data": screenshot_b64,
-                    },
-                ).model_dump()
+                screenshot_b64 = await _settle_and_capture(self.page, s)
+                return _image_result(screenshot_b64)
             else:
                 print(f"Error navigating to {url}: {exc}")
-                return GoToUrlResult(
-                    type="image",
-                    source={
-                        "type": "base64",
-                        "media_type": "image/png",
-                        "data": ERROR_IMAGE,
-                    },
-                ).model_dump()
-
-        s = self.wait_time if self.wait_time is not None else DEFAULT_SCREENSHOT_WAIT_MS
-        await _sleep(s)
-
-        screenshot_buffer = await self.page.screenshot()
-        screenshot_b64 = base64.b64encode(screenshot_buffer).decode("utf-8")
-        return GoToUrlResult(
-            type="image",
-            source={
-                "type": "base64",
-                "media_type": "image/png",
-                "data": screenshot_b64,
-            },
-        ).model_dump()
+                return ERROR_RESULT
+
+        s = self.wait_time
+        screenshot_b64 = await _settle_and_capture(self.page, s)
+        return _image_result(screenshot_b64)
 
 
 class GetCurrentUrlTool(BaseTool):
@@ -350,7 +488,10 @@ class ClaudeComputerTool(BaseTool):
     def __init__(self, page: Page, wait_time: Optional[int] = None):
         super().__init__()
         self.page = page
-        self.wait_time = wait_time
+        # Resolve the default once rather than on every action
+        self.wait_time = (
+            wait_time if wait_time is not None else DEFAULT_SCREENSHOT_WAIT_MS
+        )
 
     def _run(
         self,
@@ -381,139 +522,130 @@ class ClaudeComputerTool(BaseTool):
         # Debug log
         print(f"ClaudeComputerTool._arun called (async) with action='{action}'")
         try:
-            s = (
-                self.wait_time
-                if self.wait_time is not None
-                else DEFAULT_SCREENSHOT_WAIT_MS
-            )
-
-            if action in [ActionEnum.mouse_move, ActionEnum.left_click_drag]:
-                if not coordinate:
-                    raise ValueError(f"coordinate is required for action '{action}'")
-                x, y = coordinate
-
-                # If we want to scale the coordinates
-                # if page_width and page_height and target_width and target_height:
-                #     x, y = await _scale_coordinates(x, y, page_width, page_height,
-                #                                     target_width, target_height)
-
-                if action == ActionEnum.mouse_move:
-                    await self.page.mouse.move(x, y)
-                else:
-                    await self.page.mouse.move(x, y)
-                    await self.page.mouse.down()
-                    await self.page.mouse.move(x + 100, y + 100, steps=10)
-                    await self.page.mouse.up()
-                print(f"Waiting for {s}s")
-                await _sleep(s)
-                screenshot_buffer = await self.page.screenshot()
-                screenshot_b64 = base64.b64encode(screenshot_buffer).decode("utf-8")
-                marked_image = await _draw_circle_on_screenshot(screenshot_b64, x, y)
-                return ClaudComputerToolResult(
-                    type="image",
-                    source={
-                        "type": "base64",
-                        "media_type": "image/png",
-                        "data": marked_image,
-                    },
-                ).model_dump()
-
-            elif action == ActionEnum.key or action == ActionEnum.type:
-                if text is None:
-                    raise ValueError(f"text is required for action '{action}'")
-                # 'key' can involve combos like ctrl+s
-                if action == ActionEnum.key:
-                    keys = text.split("+")
-                    for k in keys[:-1]:
-                        await self.page.keyboard.down(_translate_key(k))
-                    await self.page.keyboard.press(_translate_key(keys[-1]))
-                    for k in reversed(keys[:-1]):
-                        await self.page.keyboard.up(_translate_key(k))
-                else:
-                    await self.page.keyboard.type(text)
-
-                await _sleep(s)
-                screenshot_buffer = await self.page.screenshot()
-                screenshot_b64 = base64.b64encode(screenshot_buffer).decode("utf-8")
-                return ClaudComputerToolResult(
-                    type="image",
-                    source={
-                        "type": "base64",
-                        "media_type": "image/png",
-                        "data": screenshot_b64,
-                    },
-                ).model_dump()
-
-            elif action in [
-                ActionEnum.left_click,
-                ActionEnum.right_click,
-                ActionEnum.middle_click,
-                ActionEnum.double_click,
-                ActionEnum.screenshot,
-                ActionEnum.cursor_position,
-            ]:
-                if action == ActionEnum.screenshot:
-                    await _sleep(s)
-                    screenshot_buffer = await self.page.screenshot()
-                    screenshot_b64 = base64.b64encode(screenshot_buffer).decode("utf-8")
-                    return ClaudComputerToolResult(
-                        type="image",
-                        source={
-                            "type": "base64",
-                            "media_type": "image/png",
-                            "data": screenshot_b64,
-                        },
-                    ).model_dump()
-
-                elif action == ActionEnum.cursor_position:
-                    # There's no direct way to get the cursor from Playwright.
-                    # Potential approach:
-                    """
-                    x = await self.page.evaluate(\"() => window.__cursorPositionX || 0\")
-                    y = await self.page.evaluate(\"() => window.__cursorPositionY || 0\")
-                    # Return those in a result if your page tracks them.
-                    """
-                    raise ValueError(
-                        "cursor_position action is not supported in Playwright."
-                    )
-
-                else:
-                    button_map = {
-                        ActionEnum.left_click: "left",
-                        ActionEnum.right_click: "right",
-                        ActionEnum.middle_click: "middle",
-                        ActionEnum.double_click: "left",
-                    }
-                    button = button_map[action]
-
-                    click_count = 2 if action == ActionEnum.double_click else 1
-                    await self.page.mouse.down(button=button, click_count=click_count)
-                    await self.page.mouse.up(button=button, click_count=click_count)
-
-                    await _sleep(s)
-                    screenshot_buffer = await self.page.screenshot()
-                    screenshot_b64 = base64.b64encode(screenshot_buffer).decode("utf-8")
-                    return ClaudComputerToolResult(
-                        type="image",
-                        source={
-                            "type": "base64",
-                            "media_type": "image/png",
-                            "data": screenshot_b64,
-                        },
-                    ).model_dump()
-            else:
+            handler = _COMPUTER_ACTIONS.get(action)
+            if handler is None:
                 raise ValueError(f"Invalid action: '{action}'")
+            return await handler(self, action, text, coordinate)
 
         except Exception as exc:
             print(f"Error executing action '{action}': {exc}")
-            return ClaudComputerToolResult(
-                type="image",
-                source={
-                    "type": "base64",
-                    "media_type": "image/png",
-                    "data": ERROR_IMAGE,
-                },
-            ).model_dump()
+            return ERROR_RESULT
+
+    async def _pointer_action(
+        self,
+        action: ActionEnum,
+        text: Optional[str],
+        coordinate: Optional[Tuple[int, int]],
+    ) -> dict:
+        """mouse_move and left_click_drag; the screenshot marks the target."""
+        if not coordinate:
+            raise ValueError(f"coordinate is required for action '{action}'")
+        x, y = coordinate
+
+        await self.page.mouse.move(x, y)
+        if action == ActionEnum.left_click_drag:
+            await self.page.mouse.down()
+            await self.page.mouse.move(x + 100, y + 100, steps=10)
+            await self.page.mouse.up()
+        s = self.wait_time
+        print(f"Waiting for {s}s")
+        marked_image = await _settle_and_capture(self.page, s, marker=(x, y))
+        return _image_result(marked_image)
+
+    async def _key_action(
+        self,
+        action: ActionEnum,
+        text: Optional[str],
+        coordinate: Optional[Tuple[int, int]],
+    ) -> dict:
+        if text is None:
+            raise ValueError(f"text is required for action '{action}'")
+        # 'key' can involve combos like ctrl+s. Playwright accepts the whole
+        # chord in one press() call, so the modifiers are held and released in
+        # order without a round-trip per key.
+        keys = text.split("+")
+        await self.page.keyboard.press("+".join(_translate_key(k) for k in keys))
+        screenshot_b64 = await _settle_and_capture(self.page, self.wait_time)
+        return _image_result(screenshot_b64)
+
+    async def _type_action(
+        self,
+        action: ActionEnum,
+        text: Optional[str],
+        coordinate: Optional[Tuple[int, int]],
+    ) -> dict:
+        if text is None:
+            raise ValueError(f"text is required for action '{action}'")
+        await self.page.keyboard.type(text)
+        screenshot_b64 = await _settle_and_capture(self.page, self.wait_time)
+        return _image_result(screenshot_b64)
+
+    async def _click_action(
+        self,
+        action: ActionEnum,
+        text: Optional[str],
+        coordinate: Optional[Tuple[int, int]],
+    ) -> dict:
+        button, click_count = _CLICK_BUTTONS[action]
+        if coordinate:
+            # mouse.click() moves and clicks in a single driver call
+            x, y = coordinate
+            await self.page.mouse.click(
+                x, y, button=button, click_count=click_count
+            )
+        else:
+            # Click wherever the pointer already is
+            await self.page.mouse.down(button=button, click_count=click_count)
+            await self.page.mouse.up(button=button, click_count=click_count)
+        screenshot_b64 = await _settle_and_capture(self.page, self.wait_time)
+        return _image_result(screenshot_b64)
+
+    async def _screenshot_action(
+        self,
+        action: ActionEnum,
+        text: Optional[str],
+        coordinate: Optional[Tuple[int, int]],
+    ) -> dict:
+        screenshot_b64 = await _settle_and_capture(self.page, self.wait_time)
+        return _image_result(screenshot_b64)
+
+    async def _cursor_position_action(
+        self,
+        action: ActionEnum,
+        text: Optional[str],
+        coordinate: Optional[Tuple[int, int]],
+    ) -> dict:
+        # There's no direct way to get the cursor from Playwright.
+        # Potential approach:
+        """
+        x = await self.page.evaluate(\"() => window.__cursorPositionX || 0\")
+        y = await self.page.evaluate(\"() => window.__cursorPositionY || 0\")
+        # Return those in a result if your page tracks them.
+        """
+        raise ValueError("cursor_position action is not supported in Playwright.")
+
+
+# (button, click_count) for each click action
+_CLICK_BUTTONS = {
+    ActionEnum.left_click: ("left", 1),
+    ActionEnum.right_click: ("right", 1),
+    ActionEnum.middle_click: ("middle", 1),
+    ActionEnum.double_click: ("left", 2),
+}
+
+# Handler for each computer action, so dispatch is a single dict lookup
+_COMPUTER_ACTIONS = {
+    ActionEnum.mouse_move: ClaudeComputerTool._pointer_action,
+    ActionEnum.left_click_drag: ClaudeComputerTool._pointer_action,
+    ActionEnum.key: ClaudeComputerTool._key_action,
+    ActionEnum.type: ClaudeComputerTool._type_action,
+    ActionEnum.left_click: ClaudeComputerTool._click_action,
+    ActionEnum.right_click: ClaudeComputerTool._click_action,
+    ActionEnum.middle_click: ClaudeComputerTool._click_action,
+    ActionEnum.double_click: ClaudeComputerTool._click_action,
+    ActionEnum.screenshot: ClaudeComputerTool._screenshot_action,
+    ActionEnum.cursor_position: ClaudeComputerTool._cursor_position_action,
+}
 
 
 class WaitTool(BaseTool):
@@ -541,78 +673,11 @@ class WaitTool(BaseTool):
             if not 0 <= seconds <= 30:
                 raise ValueError("Wait time must be between 0 and 30 seconds")
 
-            # Convert to milliseconds and wait
-            await _sleep(seconds)
-
-            # Take screenshot after waiting
-            screenshot_buffer = await self.page.screenshot()
-            screenshot_b64 = base64.b64encode(screenshot_buffer).decode("utf-8")
+            # Wait, then take screenshot
+            screenshot_b64 = await _settle_and_capture(self.page, seconds)
 
-            return ClaudComputerToolResult(
-                type="image",
-                source={
-                    "type": "base64",
-                    "media_type": "image/png",
-                    "data": screenshot_b64,
-                },
-            ).model_dump()
+            return _image_result(screenshot_b64)
 
         except Exception as exc:
             print(f"Error executing wait for {seconds} seconds: {exc}")
-            return ClaudComputerToolResult(
-                type="image",
-                source={
-                    "type": "base64",
-                    "media_type": "image/png",
-                    "data": ERROR_IMAGE,
-                },
-            ).model_dump()
-
-
-################################################################################
-# If you want a quick reference to all tools in this plugin:
-################################################################################
-
-ALL_EXAMPLE_PLUGIN_TOOLS = [
-    GoToUrlTool,
-    GetCurrentUrlTool,
-    SaveToMemoryTool,
-    ClaudeComputerTool,
-]
-
-
-def get_available_tools(page: Page):
-    """Return a dictionary of the tools provided by this plugin, using a real Page."""
-    return {
-        "go_to_url": GoToUrlTool(page),
-        "get_current_url": GetCurrentUrlTool(page),
-        "save_to_memory": SaveToMemoryTool(),
-        "claude_computer_tool": ClaudeComputerTool(page),
-    }
-
-
-# def main():
-#     """Use async_playwright to create a real Page, then get and print the tools."""
-#     import asyncio
-
-#     async def run():
-#         async with async_playwright() as p:
-#             browser = await p.chromium.launch(headless=True)
-#             page = await browser.new_page()
-#             tools = get_available_tools(page)
-
-#             for name, tool in tools.items():
-#                 print(tool, name)
-#                 print(f"Tool name: {name}")
-#                 print(f"  Description: {tool.description}")
-#                 print(f"  Args schema: {
-#                       tool.args_schema.schema_json(indent=2)}")
-#                 print(f"  Return Direct: {tool.return_direct}")
-#                 print("")
-#             await browser.close()
-
-#     asyncio.run(run())
-
-
-# if __name__ == "__main__":
-#     main()
+            return ERROR_RESULT
@@ -1,142 +1,320 @@
-from typing import Any
-from anthropic import Client
-from langchain_anthropic import ChatAnthropic
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
+from typing import TYPE_CHECKING, Any, Optional
 from langchain_core.language_models.chat_models import BaseChatModel
 from .models import ModelConfig, ModelProvider
-from typing import Sequence, Union, Dict, Type, Callable, Any
+from typing import Sequence, Union, Dict, Type, Callable
 from langchain_core.tools import BaseTool
-from langchain_anthropic.chat_models import convert_to_anthropic_tool
-from functools import cached_property
-import anthropic
+from collections import OrderedDict
+from functools import cache
+import hashlib
 import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_ollama import ChatOllama
-from pydantic import SecretStr
-
-
-class BetaChatAnthropic(ChatAnthropic):
-    """ChatAnthropic that uses the beta.messages endpoint for computer-use."""
-
-    @cached_property
-    def _client(self) -> anthropic.Client:
-        client = super()._client
-        # Force use of beta client for all messages
-        client.messages = client.beta.messages
-        return client
-
-    @cached_property
-    def _async_client(self) -> anthropic.AsyncClient:
-        client = super()._async_client
-        # Force use of beta client for all messages
-        client.messages = client.beta.messages
-        return client
-
-    def bind_tools(
-        self,
-        tools: Sequence[Union[Dict[str, Any], Type, Callable, BaseTool]],
-        **kwargs: Any,
-    ):
-        """Override bind_tools to handle Anthropic-specific tool formats"""
-        # Pass tools directly if they're in Anthropic format
-        anthropic_tools = []
-        for tool in tools:
-            if isinstance(tool, dict) and "type" in tool:
-                # Already in Anthropic format, pass through
-                anthropic_tools.append(tool)
-            else:
-                # Use default conversion for standard tools
-                anthropic_tools.append(convert_to_anthropic_tool(tool))
-
-        return super().bind(tools=anthropic_tools, **kwargs)
-
-
-def create_llm(config: ModelConfig) -> tuple[BaseChatModel | Client, bool]:
+import threading
+from pydantic import PrivateAttr, SecretStr
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from anthropic import Client
+
+load_dotenv(".env.local")
+
+# Provider fallbacks used when a request doesn't bring its own key/settings;
+# read once at import instead of on every create_llm call
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "")
+
+# The provider SDKs (anthropic, langchain_anthropic, langchain_openai,
+# langchain_google_genai, langchain_ollama) are imported inside create_llm's
+# branches: each pulls in its own HTTP client and tokenizer stack (gRPC for
+# Google), and a worker usually only ever talks to one provider.
+
+class _LRUCache:
+    """Thread-safe, bounded key -> object cache that evicts the least recently used."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: tuple, build: Callable[[], Any]) -> Any:
+        """Return the cached value for `key`, building it with `build` on a miss."""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                return value
+        value = build()
+        with self._lock:
+            # Another request may have built one meanwhile; keep the first
+            value = self._items.setdefault(key, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+
+def _key_digest(api_key: Optional[str]) -> Optional[str]:
+    """Hash an API key for use in a cache key, so raw keys are never stored."""
+    return hashlib.sha256(api_key.encode()).hexdigest() if api_key else None
+
+
+# Beta-patched Anthropic SDK clients shared across BetaChatAnthropic instances,
+# so each request reuses an existing connection pool instead of opening a new
+# one. Users can bring their own API keys, so the cache is bounded.
+MAX_CACHED_CLIENTS = 32
+_anthropic_clients = _LRUCache(MAX_CACHED_CLIENTS)
+# Guards patching those clients onto the beta endpoint
+_patch_lock = threading.Lock()
+
+# Chat models returned by create_llm, keyed by everything they are built from
+MAX_CACHED_LLMS = 32
+_llms = _LRUCache(MAX_CACHED_LLMS)
+
+
+@cache
+def _beta_chat_anthropic_cls() -> type:
+    """Build the BetaChatAnthropic class on first use; later calls reuse it."""
+    from functools import cached_property
+    import anthropic
+    from langchain_anthropic import ChatAnthropic
+    from langchain_anthropic.chat_models import convert_to_anthropic_tool
+
+    class BetaChatAnthropic(ChatAnthropic):
+        """ChatAnthropic that uses the beta.messages endpoint for computer-use."""
+
+        # (tools as passed, converted tools) from the last bind_tools call
+        _bound_tools: Optional[tuple] = PrivateAttr(default=None)
+
+        def _client_cache_key(self, kind: str) -> tuple:
+            # Everything the SDK client is built from; the API key is hashed
+            # so raw keys are not kept around as dict keys
+            return (
+                kind,
+                _key_digest(self.anthropic_api_key.get_secret_value()),
+                self.anthropic_api_url,
+                self.max_retries,
+                self.default_request_timeout,
+                tuple(sorted((self.default_headers or {}).items())),
+            )
+
+        def _beta_client(self, client: Any) -> Any:
+            # Force use of beta client for all messages. Concurrent first
+            # requests can get here with the same client; patch it only once
+            with _patch_lock:
+                if client.messages is not client.beta.messages:
+                    client.messages = client.beta.messages
+            return client
+
+        @cached_property
+        def _client(self) -> anthropic.Client:
+            return _anthropic_clients.get_or_build(
+                self._client_cache_key("sync"),
+                lambda: self._beta_client(super(BetaChatAnthropic, self)._client),
+            )
+
+        @cached_property
+        def _async_client(self) -> anthropic.AsyncClient:
+            return _anthropic_clients.get_or_build(
+                self._client_cache_key("async"),
+                lambda: self._beta_client(
+                    super(BetaChatAnthropic, self)._async_client
+                ),
+            )
+
+        def bind_tools(
+            self,
+            tools: Sequence[Union[Dict[str, Any], Type, Callable, BaseTool]],
+            **kwargs: Any,
+        ):
+            """Override bind_tools to handle Anthropic-specific tool formats"""
+            # Agents bind the same static tool list every run; skip the
+            # conversion (pydantic introspection for non-dict tools) when the
+            # exact same tool objects were bound last time
+            cached = self._bound_tools
+            if (
+                cached is not None
+                and len(cached[0]) == len(tools)
+                and all(a is b for a, b in zip(cached[0], tools))
+            ):
+                return super().bind(tools=cached[1], **kwargs)
+
+            # Pass tools directly if they're in Anthropic format
+            anthropic_tools = []
+            for tool in tools:
+                if isinstance(tool, dict) and "type" in tool:
+                    # Already in Anthropic format, pass through
+                    anthropic_tools.append(tool)
+                else:
+                    # Use default conversion for standard tools
+                    anthropic_tools.append(convert_to_anthropic_tool(tool))
+
+            self._bound_tools = (tuple(tools), anthropic_tools)
+            return super().bind(tools=anthropic_tools, **kwargs)
+
+    return BetaChatAnthropic
+
+
+def _freeze(value: Any) -> Any:
+    """Turn dicts and lists (e.g. extra_headers) into hashable tuples."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _llm_cache_key(config: ModelConfig) -> Optional[tuple]:
+    """Cache key for `config`, or None if its extra params are not hashable."""
+    try:
+        extras = _freeze(config.extra_params)
+        hash(extras)
+    except TypeError:
+        return None
+    return (
+        config.provider,
+        config.model_name,
+        config.temperature,
+        config.max_tokens,
+        config.top_k,
+        config.top_p,
+        config.frequency_penalty,
+        config.presence_penalty,
+        _key_digest(config.api_key),
+        config.azure_endpoint,
+        config.api_version,
+        extras,
+    )
+
+
+def create_llm(config: ModelConfig) -> "tuple[BaseChatModel | Client, bool]":
     """
     Returns a tuple containing:
     1. The appropriate LangChain LLM object based on the ModelConfig provider
     2. A boolean indicating whether vision should be used (False for DeepSeek, True for others)
+
+    Models are cached per configuration, so repeat requests reuse the same
+    instance and its pooled HTTP connections. The instances hold no
+    per-request state.
     """
-    if config.provider == ModelProvider.OPENAI:
-        return ChatOpenAI(
-            model_name=config.model_name or "gpt-4o-mini",
-            temperature=config.temperature,
-            max_tokens=config.max_tokens,
-            api_key=(
-                os.getenv("OPENAI_API_KEY") if not config.api_key else config.api_key
-            ),
-            **config.extra_params,
-        ), True
-    elif config.provider == ModelProvider.AZURE_OPENAI:
-        # Get Azure-specific environment variables
-        azure_endpoint = config.azure_endpoint or os.getenv("AZURE_OPENAI_ENDPOINT")
+    key = _llm_cache_key(config)
+    if key is None:
+        return _build_llm(config)
+    return _llms.get_or_build(key, lambda: _build_llm(config))
+
+
+def _build_openai(config: ModelConfig) -> "tuple[BaseChatModel, bool]":
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        model_name=config.model_name or "gpt-4o-mini",
+        temperature=config.temperature,
+        max_tokens=config.max_tokens,
+        api_key=config.api_key or OPENAI_API_KEY,
+        **config.extra_params,
+    ), True
+
+
+def _build_azure_openai(config: ModelConfig) -> "tuple[BaseChatModel, bool]":
+    from langchain_openai import AzureChatOpenAI
+
+    return AzureChatOpenAI(
         # Always use model_name as the deployment name
-        azure_deployment = config.model_name
-        api_version = config.api_version or os.getenv("AZURE_OPENAI_API_VERSION", "2025-01-01-preview")
-        
-        return AzureChatOpenAI(
-            azure_deployment=azure_deployment,
-            temperature=config.temperature,
-            max_tokens=config.max_tokens,
-            azure_endpoint=azure_endpoint,
-            api_version=api_version,
-            api_key=(
-                os.getenv("AZURE_OPENAI_API_KEY") if not config.api_key else config.api_key
-            ),
-            **config.extra_params,
-        ), True
-    elif config.provider == ModelProvider.ANTHROPIC:
-        return ChatAnthropic(
-            model=config.model_name or "claude-3-7-sonnet-latest",
-            max_tokens_to_sample=config.max_tokens,
-            temperature=config.temperature,
-            api_key=(
-                os.getenv("ANTHROPIC_API_KEY") if not config.api_key else config.api_key
-            ),
-            **config.extra_params,
-        ), True
-    elif config.provider == ModelProvider.ANTHROPIC_COMPUTER_USE:
-        return BetaChatAnthropic(
-            model=config.model_name or "claude-3-5-sonnet-20241022",
-            max_tokens_to_sample=config.max_tokens,
-            temperature=config.temperature,
-            anthropic_api_key=(
-                os.getenv("ANTHROPIC_API_KEY") if not config.api_key else config.api_key
-            ),
-            **config.extra_params,
-        ), True
-    elif config.provider == ModelProvider.GEMINI:
-        return ChatGoogleGenerativeAI(
-            model=config.model_name or "gemini-2.0-flash",
-            temperature=config.temperature,
-            max_output_tokens=config.max_tokens,
-            google_api_key=(
-                os.getenv("GOOGLE_API_KEY") if not config.api_key else config.api_key
-            ),
-            **config.extra_params,
-        ), True
-    elif config.provider == ModelProvider.DEEPSEEK:
-        api_key = config.api_key or os.getenv("DEEPSEEK_API_KEY", "")
-        
-        return ChatOpenAI(
-            base_url="https://api.deepseek.com/v1",
-            model_name=config.model_name or "deepseek-chat",
-            temperature=config.temperature,
-            max_tokens=config.max_tokens,
-            api_key=SecretStr(api_key),
-            **config.extra_params,
-        ), False
-    elif config.provider == ModelProvider.OLLAMA:
-        # Extract base model name if it contains a tag (e.g., "qwen2.5:32b" -> "qwen2.5")
-        model_name = config.model_name or "llama3.3"
-        base_model_name = model_name.split(':')[0] if ':' in model_name else model_name
-        
-        return ChatOllama(
-            model=base_model_name,  # Use the base model name without tags
-            temperature=config.temperature,
-            num_ctx=config.extra_params.get("num_ctx", 32000),
-            # Ollama connects to a local instance and doesn't require an API key
-            **{k: v for k, v in config.extra_params.items() if k != "num_ctx"},
-        ), True
-    else:
-        raise ValueError(f"Unsupported provider: {config.provider}")
+        azure_deployment=config.model_name,
+        temperature=config.temperature,
+        max_tokens=config.max_tokens,
+        azure_endpoint=config.azure_endpoint or AZURE_OPENAI_ENDPOINT,
+        api_version=config.api_version or AZURE_OPENAI_API_VERSION,
+        api_key=config.api_key or AZURE_OPENAI_API_KEY,
+        **config.extra_params,
+    ), True
+
+
+def _build_anthropic(config: ModelConfig) -> "tuple[BaseChatModel, bool]":
+    from langchain_anthropic import ChatAnthropic
+
+    return ChatAnthropic(
+        model=config.model_name or "claude-3-7-sonnet-latest",
+        max_tokens_to_sample=config.max_tokens,
+        temperature=config.temperature,
+        api_key=config.api_key or ANTHROPIC_API_KEY,
+        **config.extra_params,
+    ), True
+
+
+def _build_anthropic_computer_use(
+    config: ModelConfig,
+) -> "tuple[BaseChatModel, bool]":
+    return _beta_chat_anthropic_cls()(
+        model=config.model_name or "claude-3-5-sonnet-20241022",
+        max_tokens_to_sample=config.max_tokens,
+        temperature=config.temperature,
+        anthropic_api_key=config.api_key or ANTHROPIC_API_KEY,
+        **config.extra_params,
+    ), True
+
+
+def _build_gemini(config: ModelConfig) -> "tuple[BaseChatModel, bool]":
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=config.model_name or "gemini-2.0-flash",
+        temperature=config.temperature,
+        max_output_tokens=config.max_tokens,
+        google_api_key=config.api_key or GOOGLE_API_KEY,
+        **config.extra_params,
+    ), True
+
+
+def _build_deepseek(config: ModelConfig) -> "tuple[BaseChatModel, bool]":
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        base_url="https://api.deepseek.com/v1",
+        model_name=config.model_name or "deepseek-chat",
+        temperature=config.temperature,
+        max_tokens=config.max_tokens,
+        api_key=SecretStr(config.api_key or DEEPSEEK_API_KEY),
+        **config.extra_params,
+    ), False
+
+
+def _build_ollama(config: ModelConfig) -> "tuple[BaseChatModel, bool]":
+    from langchain_ollama import ChatOllama
+
+    # Extract base model name if it contains a tag (e.g., "qwen2.5:32b" -> "qwen2.5")
+    model_name = config.model_name or "llama3.3"
+    base_model_name = model_name.split(':')[0] if ':' in model_name else model_name
+
+    return ChatOllama(
+        model=base_model_name,  # Use the base model name without tags
+        temperature=config.temperature,
+        num_ctx=config.extra_params.get("num_ctx", 32000),
+        # Ollama connects to a local instance and doesn't require an API key
+        **{k: v for k, v in config.extra_params.items() if k != "num_ctx"},
+    ), True
+
+
+# Builder for each provider; the second item of each result says whether
+# vision should be used (False for DeepSeek)
+_BUILDERS: Dict[
+    ModelProvider, Callable[[ModelConfig], "tuple[BaseChatModel, bool]"]
+] = {
+    ModelProvider.OPENAI: _build_openai,
+    ModelProvider.AZURE_OPENAI: _build_azure_openai,
+    ModelProvider.ANTHROPIC: _build_anthropic,
+    ModelProvider.ANTHROPIC_COMPUTER_USE: _build_anthropic_computer_use,
+    ModelProvider.GEMINI: _build_gemini,
+    ModelProvider.DEEPSEEK: _build_deepseek,
+    ModelProvider.OLLAMA: _build_ollama,
+}
+
+
+def _build_llm(config: ModelConfig) -> "tuple[BaseChatModel | Client, bool]":
+    try:
+        builder = _BUILDERS[config.provider]
+    except KeyError:
+        raise ValueError(f"Unsupported provider: {config.provider}") from None
+    return builder(config)
@@ -1,4 +1,7 @@
-import json
+import orjson
+import os
+import time
+from dotenv import load_dotenv
 from typing import AsyncGenerator
 
 """
@@ -14,118 +17,282 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+load_dotenv(".env.local")
+
+# Text frames are coalesced so token bursts go out as one write. Buffered
+# text is written once it reaches STREAM_COALESCE_BYTES, when a chunk
+# arrives STREAM_COALESCE_MS or more after the last write, ahead of any
+# tool-related chunk, and at the end of the stream. There is no timer: text
+# is held at most until the next chunk. STREAM_COALESCE_BYTES=0 sends every
+# frame as soon as it's made.
+STREAM_COALESCE_BYTES = int(os.getenv("STREAM_COALESCE_BYTES", "512"))
+STREAM_COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", "5"))
+
+# Fixed-shape protocol lines and line fragments as bytes, built once;
+# lines are joined from these and orjson output without any str round trip
+_FINISH_LINE = (
+    b'e:{"finishReason":"tool-calls","usage":{"promptTokens":0,"completionTokens":0}}\n'
+)
+_STOP_LINE = (
+    b'e:{"finishReason":"stop","usage":{"promptTokens":0,"completionTokens":0},'
+    b'"isContinued":false}\n'
+)
+_PFX_TEXT = b"0:"
+_PFX_ERROR = b"3:"
+_PFX_TOOL_CALL = b'9:{"toolCallId":"'
+_PFX_TOOL_RESULT = b'a:{"toolCallId":"'
+_MID_TOOL_NAME = b'","toolName":"'
+_MID_ARGS = b'","args":'
+_MID_RESULT = b'","result":'
+_END_OBJECT = b"}\n"
+_EOL = b"\n"
+
+
+def _text_line(text: str) -> bytes:
+    return b"".join((_PFX_TEXT, orjson.dumps(text), _EOL))
+
+
+def _tool_call_line(tool_call_id, tool_name, args: bytes | bytearray) -> bytes:
+    return b"".join(
+        (
+            _PFX_TOOL_CALL,
+            str(tool_call_id).encode(),
+            _MID_TOOL_NAME,
+            str(tool_name).encode(),
+            _MID_ARGS,
+            args,
+            _END_OBJECT,
+        )
+    )
+
+
+class _TextCoalescer:
+    """
+    Buffers text frames so a burst of small tokens is written once. Any
+    other frame is written together with the buffered text ahead of it, so
+    frames always keep their order.
+    """
+
+    def __init__(self, max_bytes: int, max_delay: float):
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._buf = bytearray()
+        # Nothing written yet, so the first frame goes out immediately
+        self._last_write = float("-inf")
+
+    def flush(self) -> bytes:
+        """Return and clear any buffered text (maybe b"")."""
+        return self.frame(b"")
+
+    def text(self, line: bytes) -> bytes:
+        """Buffer a text frame; return what is due to be written (maybe b"")."""
+        buf = self._buf
+        buf += line
+        now = time.monotonic()
+        if len(buf) < self.max_bytes and now - self._last_write < self.max_delay:
+            return b""
+        self._last_write = now
+        out = bytes(buf)
+        buf.clear()
+        return out
+
+    def frame(self, line: bytes) -> bytes:
+        """Return `line` preceded by any buffered text."""
+        self._last_write = time.monotonic()
+        if not self._buf:
+            return line
+        out = bytes(self._buf) + line
+        self._buf.clear()
+        return out
+
+
+def _new_args_scan() -> dict:
+    return {"depth": 0, "in_string": False, "escape": False, "opened": False}
+
+
+def _scan_args(scan: dict, delta: str) -> bool:
+    """
+    Advance a tool call's bracket-balance state over a new arguments
+    fragment. Returns True once the top-level JSON value has closed, so the
+    arguments only need parsing once instead of on every fragment.
+    """
+    depth = scan["depth"]
+    in_string = scan["in_string"]
+    escape = scan["escape"]
+    opened = scan["opened"]
+    for ch in delta:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{" or ch == "[":
+            depth += 1
+            opened = True
+        elif ch == "}" or ch == "]":
+            depth -= 1
+    scan["depth"] = depth
+    scan["in_string"] = in_string
+    scan["escape"] = escape
+    scan["opened"] = opened
+    return opened and depth == 0
+
+
+def _content_text(content) -> str:
+    """
+    Return the text of a message chunk's content. Text items of list content
+    are joined into one string, so a chunk becomes a single text part
+    instead of one encoded line per item.
+    """
+    if isinstance(content, list):
+        return "".join(
+            item["text"] for item in content if item.get("type") == "text"
+        )
+    return content
+
 
 async def stream_vercel_format(
     stream: AsyncGenerator[str, None],
-) -> AsyncGenerator[str, None]:
+) -> AsyncGenerator[bytes, None]:
     """
     stream: yields partial text chunks from the LLM in the Vercel AI Data Stream Protocol format
     """
 
     draft_tool_calls = {}
     pending_tool_calls = set()
+    coalescer = _TextCoalescer(STREAM_COALESCE_BYTES, STREAM_COALESCE_MS / 1000)
 
     try:
         async for chunk in stream:
 
             if isinstance(chunk, dict) and chunk.get("stop"):
-                yield 'e:{{"finishReason":"{reason}","usage":{{"promptTokens":{prompt},"completionTokens":{completion}}}}}\n'.format(
-                    reason="tool-calls",
-                    prompt=0,
-                    completion=0,
-                )
+                yield coalescer.frame(_FINISH_LINE)
+
+            # Look each attribute up once per chunk; hasattr followed by a
+            # second attribute access does the work twice
+            tool_call_chunks = getattr(chunk, "tool_call_chunks", None)
+            tool_calls = getattr(chunk, "tool_calls", None)
+            tool_call_id = getattr(chunk, "tool_call_id", None)
+            content = getattr(chunk, "content", None)
+
+            # Buffered text goes out before anything tool-related, even if
+            # this chunk doesn't complete a frame yet
+            if tool_call_chunks or tool_calls or tool_call_id:
+                pending_text = coalescer.flush()
+                if pending_text:
+                    yield pending_text
 
             # Handle tool call chunks
-            if hasattr(chunk, "tool_call_chunks") and chunk.tool_call_chunks:
-                for tool_chunk in chunk.tool_call_chunks:
+            if tool_call_chunks:
+                for tool_chunk in tool_call_chunks:
                     index = tool_chunk.get("index")
                     # extra debugging
                     # print("DEBUG: Tool chunk details:", tool_chunk)
                     if index is not None:
                         # Initialize new tool call if needed
                         if index not in draft_tool_calls and tool_chunk.get("id"):
-                            draft_tool_calls[index] = {
-                                "id": tool_chunk["id"],
-                                "name": tool_chunk["name"],
-                                "arguments": "",
-                            }
+                            # [id, name, argument bytes, bracket scan]; the
+                            # arguments grow in place and the scan means they
+                            # are only parsed once they can be complete
+                            draft_tool_calls[index] = [
+                                tool_chunk["id"],
+                                tool_chunk["name"],
+                                bytearray(),
+                                _new_args_scan(),
+                            ]
                             pending_tool_calls.add(tool_chunk["id"])
 
                         # Append arguments if they exist
-                        if tool_chunk.get("args") and index in draft_tool_calls:
-                            draft_tool_calls[index]["arguments"] += tool_chunk["args"]
+                        args_delta = tool_chunk.get("args")
+                        if args_delta and index in draft_tool_calls:
+                            draft = draft_tool_calls[index]
+                            draft_id, draft_name, arguments, scan = draft
+                            arguments += args_delta.encode()
+
+                            if scan is not None:
+                                if not _scan_args(scan, args_delta):
+                                    continue
+                            # Without a scan, the arguments can only be
+                            # complete once a closing brace arrives
+                            elif "}" not in args_delta:
+                                continue
 
                             # If we have a complete tool call (has id, name and arguments), emit it
-                            tool_call = draft_tool_calls[index]
-                            if (
-                                tool_call["id"]
-                                and tool_call["name"]
-                                and tool_call["arguments"]
-                            ):
+                            if draft_id and draft_name:
                                 try:
                                     # Validate it's valid JSON before emitting
-                                    json.loads(tool_call["arguments"])
+                                    orjson.loads(arguments)
 
-                                    yield '9:{{"toolCallId":"{id}","toolName":"{name}","args":{args}}}\n'.format(
-                                        id=tool_call["id"],
-                                        name=tool_call["name"],
-                                        args=tool_call["arguments"],
+                                    yield coalescer.frame(
+                                        _tool_call_line(
+                                            draft_id, draft_name, arguments
+                                        )
                                     )
-                                except json.JSONDecodeError:
-                                    # Arguments not complete yet, continue gathering
-                                    print(
-                                        "DEBUG: Arguments not complete yet, continuing"
+                                except orjson.JSONDecodeError:
+                                    # Arguments not complete yet, continue gathering;
+                                    # the scan was fooled, so fall back to
+                                    # parsing on every closing brace
+                                    draft[3] = None
+                                    logger.debug(
+                                        "Arguments not complete yet, continuing"
                                     )
 
             # Handle full tool calls
-            elif hasattr(chunk, "tool_calls") and chunk.tool_calls:
-                if hasattr(chunk, "content"):
-                    if isinstance(chunk.content, list):
-                        for item in chunk.content:
-                            if item.get("type") == "text":
-                                yield f"0:{json.dumps(item['text'])}\n"
-                    else:
-                        yield f"0:{json.dumps(chunk.content)}\n"
-                for tool_call in chunk.tool_calls:
-                    logger.info(f"Emitting tool call: {tool_call.get('id')}")
+            elif tool_calls:
+                if content:
+                    text = _content_text(content)
+                    if text:
+                        out = coalescer.text(_text_line(text))
+                        if out:
+                            yield out
+                for tool_call in tool_calls:
+                    logger.info("Emitting tool call: %s", tool_call.get("id"))
                     pending_tool_calls.add(tool_call.get("id"))
-                    yield f'9:{{"toolCallId":"{tool_call.get("id")}","toolName":"{tool_call.get("name")}","args":{json.dumps(tool_call.get("args"))}}}\n'
+                    yield coalescer.frame(
+                        _tool_call_line(
+                            tool_call.get("id"),
+                            tool_call.get("name"),
+                            orjson.dumps(tool_call.get("args")),
+                        )
+                    )
 
             # Handle tool call results (that are not tool_call_chunks)
-            elif hasattr(chunk, "tool_call_id") and chunk.tool_call_id:
-                logger.info(f"Found tool_call_id: {chunk.tool_call_id}")
-                logger.info(f"Emitting tool result for: {chunk.tool_call_id}")
-                # Only try to remove if it exists in the set
-                if chunk.tool_call_id in pending_tool_calls:
-                    pending_tool_calls.remove(chunk.tool_call_id)
-                yield f'a:{{"toolCallId":"{chunk.tool_call_id}","result":{json.dumps(chunk.content)}}}\n'
+            elif tool_call_id:
+                logger.info("Found tool_call_id: %s", tool_call_id)
+                logger.info("Emitting tool result for: %s", tool_call_id)
+                pending_tool_calls.discard(tool_call_id)
+                yield coalescer.frame(
+                    b"".join(
+                        (
+                            _PFX_TOOL_RESULT,
+                            str(tool_call_id).encode(),
+                            _MID_RESULT,
+                            orjson.dumps(content),
+                            _END_OBJECT,
+                        )
+                    )
+                )
 
                 # Check if this is the last tool result by looking at stop_reason
                 if len(pending_tool_calls) == 0:
                     draft_tool_calls = {}
-                    logger.info(f"Emitting finish reason after final tool result")
-                    yield 'e:{{"finishReason":"{reason}","usage":{{"promptTokens":{prompt},"completionTokens":{completion}}}}}\n'.format(
-                        reason="tool-calls",
-                        prompt=0,
-                        completion=0,
-                    )
+                    logger.info("Emitting finish reason after final tool result")
+                    yield coalescer.frame(_FINISH_LINE)
 
             # Handle regular text content
-            elif hasattr(chunk, "content") and chunk.content:
-                # print("DEBUG: Found text content:", chunk.content)
-                if isinstance(chunk.content, list):
-                    for item in chunk.content:
-                        if item.get("type") == "text":
-                            yield f"0:{json.dumps(item['text'])}\n"
-                else:
-                    yield f"0:{json.dumps(chunk.content)}\n"
+            elif content:
+                # print("DEBUG: Found text content:", content)
+                text = _content_text(content)
+                if text:
+                    out = coalescer.text(_text_line(text))
+                    if out:
+                        yield out
     except Exception as e:
-        yield f"3:{json.dumps(e.__str__())}\n"
+        yield coalescer.frame(b"".join((_PFX_ERROR, orjson.dumps(str(e)), _EOL)))
     finally:
-        finish_reason = "stop"
         # Yield the final finish part
-        usage_obj = {
-            "promptTokens": 0,
-            "completionTokens": 0,
-        }
-        yield f"e:{json.dumps({'finishReason': finish_reason, 'usage': usage_obj, 'isContinued': False})}\n"
+        yield coalescer.frame(_STOP_LINE)
@@ -1,5 +1,5 @@
-import json
-from pydantic import BaseModel
+import orjson
+from pydantic import BaseModel, ConfigDict
 from typing import Any, List, Mapping, Optional
 from .types import ToolInvocation
 from langchain_core.messages import BaseMessage, ChatMessage
@@ -8,27 +8,72 @@ from langchain_core.tools.structured import ToolCall
 
 
 class ClientAttachment(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     url: str
     contentType: str
 
 
 class ClientMessage(BaseModel):
+    # Parsed once per request and only read afterwards
+    model_config = ConfigDict(frozen=True)
+
     role: str
-    content: str | List[str | Mapping[str, Any]]
-    experimental_attachments: Optional[List[ClientAttachment]] = None
-    toolInvocations: Optional[List[ToolInvocation]] = None
+    content: str | list[str | dict[str, Any]]
+    experimental_attachments: Optional[list[ClientAttachment]] = None
+    toolInvocations: Optional[list[ToolInvocation]] = None
 
 
 def convert_to_chat_messages(messages: List[ClientMessage]):
     chat_messages = []
+    # Bound once; this runs over the whole history on every request
+    _dumps = orjson.dumps
+    _append = chat_messages.append
+    _extend = chat_messages.extend
 
     for message in messages:
-        parts = []
+        if message.toolInvocations:
+            tool_calls = []
+            tool_results = []
+            for tool_invocation in message.toolInvocations:
+                tool_calls.append(
+                    {
+                        "id": tool_invocation.toolCallId,
+                        "type": "function",
+                        "function": {
+                            "name": tool_invocation.toolName,
+                            "arguments": _dumps(tool_invocation.args).decode(),
+                        },
+                    }
+                )
+                tool_results.append(
+                    {
+                        "role": "tool",
+                        "content": _dumps(tool_invocation.result).decode(),
+                        "tool_call_id": tool_invocation.toolCallId,
+                    }
+                )
+
+            _append({"role": "assistant", "tool_calls": tool_calls})
+            _extend(tool_results)
+            continue
+
+        content = message.content
+        attachments = message.experimental_attachments
 
-        parts.append({"type": "text", "text": message.content})
+        # Plain text with nothing attached needs no parts wrapper
+        if not attachments and isinstance(content, str):
+            # Empty text parts only cost tokens (Anthropic rejects them outright)
+            if content:
+                _append({"role": message.role, "content": content})
+            continue
 
-        if message.experimental_attachments:
-            for attachment in message.experimental_attachments:
+        parts = []
+        if content:
+            parts.append({"type": "text", "text": content})
+
+        if attachments:
+            for attachment in attachments:
                 if attachment.contentType.startswith("image"):
                     parts.append(
                         {"type": "image_url", "image_url": {"url": attachment.url}}
@@ -37,42 +82,19 @@ def convert_to_chat_messages(messages: List[ClientMessage]):
                 elif attachment.contentType.startswith("text"):
                     parts.append({"type": "text", "text": attachment.url})
 
-        if message.toolInvocations:
-            tool_calls = [
-                {
-                    "id": tool_invocation.toolCallId,
-                    "type": "function",
-                    "function": {
-                        "name": tool_invocation.toolName,
-                        "arguments": json.dumps(tool_invocation.args),
-                    },
-                }
-                for tool_invocation in message.toolInvocations
-            ]
-
-            chat_messages.append({"role": "assistant", "tool_calls": tool_calls})
-
-            tool_results = [
-                {
-                    "role": "tool",
-                    "content": json.dumps(tool_invocation.result),
-                    "tool_call_id": tool_invocation.toolCallId,
-                }
-                for tool_invocation in message.toolInvocations
-            ]
-
-            chat_messages.extend(tool_results)
-
+        if not parts:
+            # Nothing left to send for this message
             continue
 
-        chat_messages.append({"role": message.role, "content": parts})
+        _append({"role": message.role, "content": parts})
 
     return chat_messages
 
 
 def convert_to_base_messages(messages: List[ClientMessage]) -> List[BaseMessage]:
-    chat_messages = convert_to_chat_messages(messages)
-    return [BaseMessage(**message) for message in chat_messages]
+    # BaseMessage(**message) can't represent tool calls or tool results;
+    # build the concrete message types the agents use instead
+    return chat_dict_to_base_messages(convert_to_chat_messages(messages))
 
 
 def chat_dict_to_chat_messages(messages: List[Mapping[str, Any]]) -> List[ChatMessage]:
@@ -82,42 +104,63 @@ def chat_dict_to_chat_messages(messages: List[Mapping[str, Any]]) -> List[ChatMe
     ]
 
 
-def chat_dict_to_base_messages(messages: List[Mapping[str, Any]]) -> List[BaseMessage]:
-    def extract_content(content_array):
-        if isinstance(content_array, list):
-            # Extract text from content array with type/text structure
-            return " ".join(
-                item["text"] for item in content_array if item["type"] == "text"
+def _extract_content(content_array):
+    if isinstance(content_array, list):
+        # Tool-call-only assistant turns usually carry no content at all
+        if not content_array:
+            return ""
+        # Most turns are a single text item; skip the filter and join
+        if len(content_array) == 1:
+            item = content_array[0]
+            return item["text"] if item["type"] == "text" else ""
+        # Extract text from content array with type/text structure
+        return " ".join(
+            [item["text"] for item in content_array if item["type"] == "text"]
+        )
+    return content_array
+
+
+def _tool_message(message: Mapping[str, Any]) -> ToolMessage:
+    return ToolMessage(
+        tool_call_id=message["tool_call_id"],
+        # Tool results carry base64 screenshots; orjson parses
+        # them several times faster than the stdlib
+        content=orjson.loads(message["content"]),
+    )
+
+
+def _assistant_message(message: Mapping[str, Any]) -> AIMessage:
+    if "tool_calls" not in message:
+        return AIMessage(content=message["content"])
+    loads = orjson.loads
+    return AIMessage(
+        content=_extract_content(message.get("content", "")),
+        tool_calls=[
+            ToolCall(
+                id=tool["id"],
+                type=tool["type"],
+                name=tool["function"]["name"],
+                args=loads(tool["function"]["arguments"]),
             )
-        return content_array
+            for tool in message["tool_calls"]
+        ],
+    )
+
+
+def _human_message(message: Mapping[str, Any]) -> HumanMessage:
+    return HumanMessage(content=message["content"])
+
+
+# Message builder per role; any other role becomes a HumanMessage
+_MESSAGE_BUILDERS = {
+    "tool": _tool_message,
+    "assistant": _assistant_message,
+}
+
 
+def chat_dict_to_base_messages(messages: List[Mapping[str, Any]]) -> List[BaseMessage]:
+    get_builder = _MESSAGE_BUILDERS.get
     return [
-        (
-            ToolMessage(
-                tool_call_id=message["tool_call_id"],
-                content=json.loads(message["content"]),
-            )
-            if message["role"] == "tool"
-            else (
-                AIMessage(
-                    content=extract_content(message.get("content", "")),
-                    tool_calls=[
-                        ToolCall(
-                            id=tool["id"],
-                            type=tool["type"],
-                            name=tool["function"]["name"],
-                            args=json.loads(tool["function"]["arguments"]),
-                        )
-                        for tool in message["tool_calls"]
-                    ],
-                )
-                if message["role"] == "assistant" and "tool_calls" in message
-                else (
-                    AIMessage(content=message["content"])
-                    if message["role"] == "assistant"
-                    else HumanMessage(content=message["content"])
-                )
-            )
-        )
+        get_builder(message["role"], _human_message)(message)
         for message in messages
     ]
@@ -1,24 +1,30 @@
-from pydantic import BaseModel, Field
-from typing import List, Mapping, Any, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Any, Optional
 
 
 class ToolInvocation(BaseModel):
+    # Only ever read after the request is parsed
+    model_config = ConfigDict(frozen=True)
+
     toolCallId: str
     toolName: str
-    args: Mapping[str, Any]
-    result: Optional[str | List[Mapping[str, Any]]] = None
+    args: dict[str, Any]
+    result: Optional[str | list[dict[str, Any]]] = None
     state: str = "call"  # "call" or "result"
 
 
 class AgentSettings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     steps: Optional[int] = None
     system_prompt: Optional[str] = None
     num_images_to_keep: Optional[int] = Field(default=10, ge=1, le=50)
     wait_time_between_steps: Optional[int] = Field(default=1, ge=0, le=10)
-    steps: Optional[int] = None
 
 
 class ModelSettings(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     model_choice: str
     max_tokens: int = Field(default=1000, ge=1, le=4096)
     temperature: float = Field(default=0.7, ge=0, le=1)